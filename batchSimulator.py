@@ -0,0 +1,262 @@
+import random
+import numpy as np
+import game as GAME
+
+# Playouts of many games at once, with NumPy.
+#
+# The states of B games are held as arrays with the game on the first axis:
+#   pawnCells  (B, 2)      : cell (row * 9 + col) of each pawn
+#   openDown   (B, 81)     : the way (row, col) <-> (row + 1, col) is open, as game.Game.openWays["upDown"]
+#   openRight  (B, 81)     : the way (row, col) <-> (row, col + 1) is open, as game.Game.openWays["leftRight"]
+#   validWalls (B, 2, 64)  : valid next horizontal / vertical walls, at (row * 8 + col)
+#   distances  (B, 2, 81)  : distance of each cell to the goal row of each pawn, not considering pawns
+# and each step moves every unfinished game once, with the playout policy of MonteCarloTreeSearch.simulate:
+# with probability 0.7 a step on a shortest path, otherwise a probable wall or, failing that, a step backwards.
+#
+# Distances are computed by a breadth first search from the goal rows of all games at once,
+# which grows the reached cells by shifting them along the open ways.
+# Pawns do not change them, so they are computed again only after a wall is placed.
+
+NUM_CELLS = 81
+NUM_WALLS = 64
+INF_DISTANCE = 1000
+
+# pawn moves in the order of game.MOVES: up, left, right, down
+STEPS = [-9, -1, 1, 9]
+# moves to the sides of each move, for jumping beside the other pawn
+SIDE_MOVES = [(1, 2), (0, 3), (0, 3), (1, 2)]
+# moves whose ways are in openDown (the others are in openRight)
+VERTICAL_MOVES = [True, False, False, True]
+
+
+def bitsArray(mask, numBits) :
+    return np.array([(mask >> i) & 1 for i in range(numBits)], dtype = bool)
+
+
+_rows = np.arange(NUM_CELLS) // 9
+_cols = np.arange(NUM_CELLS) % 9
+# ON_BOARD[move][cell]: the move does not leave the board
+ON_BOARD = np.array([_rows > 0, _cols > 0, _cols < 8, _rows < 8])
+# WAY_CELLS[move][cell]: index of the way of the move in openDown or openRight (0 when off board)
+WAY_CELLS = np.array([
+    np.where(_rows > 0, np.arange(NUM_CELLS) - 9, 0),
+    np.where(_cols > 0, np.arange(NUM_CELLS) - 1, 0),
+    np.arange(NUM_CELLS),
+    np.arange(NUM_CELLS),
+])
+
+# walls are indexed by (0 for horizontal, 1 for vertical) * 64 + row * 8 + col
+# WALL_CLOSES[wall]: ways closed by the wall, (openDown, openRight)
+WALL_CLOSES = np.zeros((2 * NUM_WALLS, 2, NUM_CELLS), dtype = bool)
+# WALL_INVALIDATES[wall]: walls which become invalid after placing the wall
+WALL_INVALIDATES = np.zeros((2 * NUM_WALLS, 2 * NUM_WALLS), dtype = bool)
+for _w in range(NUM_WALLS) :
+    # the way of an edge is at its first cell (see game.EDGE_CELLS): upDown ways of a horizontal wall, leftRight ways of a vertical wall
+    for _edge in GAME.HORIZONTAL_WALL_EDGES[_w] :
+        WALL_CLOSES[_w, 0, GAME.EDGE_CELLS[_edge][0]] = True
+    for _edge in GAME.VERTICAL_WALL_EDGES[_w] :
+        WALL_CLOSES[NUM_WALLS + _w, 1, GAME.EDGE_CELLS[_edge][0]] = True
+    for _wallType, _invalidates in enumerate([GAME.HORIZONTAL_WALL_INVALIDATES[_w], GAME.VERTICAL_WALL_INVALIDATES[_w]]) :
+        WALL_INVALIDATES[_wallType * NUM_WALLS + _w] = np.concatenate([bitsArray(_invalidates[0], NUM_WALLS), bitsArray(_invalidates[1], NUM_WALLS)])
+
+# walls beside a pawn standing on each cell, and leftmost and rightmost horizontal walls (see probableValidNextWalls)
+WALLS_BESIDE_CELL = np.array([np.concatenate([bitsArray(horizontal, NUM_WALLS), bitsArray(vertical, NUM_WALLS)])
+                              for horizontal, vertical in GAME.WALLS_BESIDE_CELL])
+SIDE_WALLS = np.concatenate([bitsArray(GAME.SIDE_HORIZONTAL_WALLS, NUM_WALLS), np.zeros(NUM_WALLS, dtype = bool)])
+
+
+def distancesToGoalRows(openDown, openRight, goalRows) :
+    # openDown, openRight: (n, 81), goalRows: (n, 2)
+    # returns the distances (n, 2, 81) of every cell to the goal row of each pawn, INF_DISTANCE if not reachable
+    n = len(goalRows)
+    down = openDown.reshape(n, 1, 9, 9)
+    right = openRight.reshape(n, 1, 9, 9)
+    frontier = np.arange(9)[None, None, :, None] == goalRows[:, :, None, None]
+    frontier = np.broadcast_to(frontier, (n, 2, 9, 9)).copy()
+    reached = frontier.copy()
+    distances = np.where(reached, 0, INF_DISTANCE)
+    for distance in range(1, NUM_CELLS) :
+        grown = np.zeros_like(frontier)
+        grown[:, :, :-1, :] |= frontier[:, :, 1:, :] & down[:, :, :-1, :]
+        grown[:, :, 1:, :] |= frontier[:, :, :-1, :] & down[:, :, :-1, :]
+        grown[:, :, :, :-1] |= frontier[:, :, :, 1:] & right[:, :, :, :-1]
+        grown[:, :, :, 1:] |= frontier[:, :, :, :-1] & right[:, :, :, :-1]
+        frontier = grown & ~reached
+        if (not frontier.any()) :
+            break
+        reached |= frontier
+        distances[frontier] = distance
+    return distances.reshape(n, 2, NUM_CELLS)
+
+
+class BatchSimulator :
+    def __init__(self, games, seed = None) :
+        # games: positions of game.Game, one for each simulated game.
+        # The same position may be given several times, e.g. for many playouts from one leaf.
+        self.rng = np.random.default_rng(random.getrandbits(64) if seed is None else seed)
+
+        rowOfGame = {}
+        positions = []
+        rows = []
+        for game in games :
+            if (not id(game) in rowOfGame) :
+                rowOfGame[id(game)] = len(positions)
+                positions.append(game)
+            rows.append(rowOfGame[id(game)])
+        rows = np.array(rows, dtype = int)
+
+        pawnCells = np.zeros((len(positions), 2), dtype = int)
+        goalRows = np.zeros((len(positions), 2), dtype = int)
+        leftWalls = np.zeros((len(positions), 2), dtype = int)
+        turns = np.zeros(len(positions), dtype = int)
+        winners = np.full(len(positions), -1)
+        openDown = np.zeros((len(positions), NUM_CELLS), dtype = bool)
+        openRight = np.zeros((len(positions), NUM_CELLS), dtype = bool)
+        validWalls = np.zeros((len(positions), 2 * NUM_WALLS), dtype = bool)
+        for i, game in enumerate(positions) :
+            for pawn in game.board.pawns :
+                pawnCells[i, pawn.index] = pawn.position.row * 9 + pawn.position.col
+                goalRows[i, pawn.index] = pawn.goalRow
+                leftWalls[i, pawn.index] = pawn.numberOfLeftWalls
+            turns[i] = game.turn
+            if (not game.winner is None) :
+                winners[i] = game.winner.index
+            openWays = game.openWays
+            openDown[i, :72] = np.array(openWays["upDown"], dtype = bool).reshape(72)
+            openRight[i] = np.pad(np.array(openWays["leftRight"], dtype = bool), ((0, 0), (0, 1))).reshape(NUM_CELLS)
+            validNextWalls = game.validNextWalls
+            validWalls[i] = np.concatenate([np.array(validNextWalls["horizontal"], dtype = bool).reshape(NUM_WALLS),
+                                            np.array(validNextWalls["vertical"], dtype = bool).reshape(NUM_WALLS)])
+
+        self.pawnCells = pawnCells[rows]
+        self.goalRows = goalRows[rows]
+        self.leftWalls = leftWalls[rows]
+        self.turns = turns[rows]
+        self.winners = winners[rows]
+        self.openDown = openDown[rows]
+        self.openRight = openRight[rows]
+        self.validWalls = validWalls[rows]
+        # a wall is placed: every wall closes two ways
+        self.hasWalls = self.openDown.sum(axis = 1) + self.openRight.sum(axis = 1) < 144
+        # as pawnMoveFlag of simulate: no probable wall was found at the last try
+        self.pawnMoveFlags = np.zeros(len(rows), dtype = bool)
+        self.distances = distancesToGoalRows(openDown, openRight, goalRows)[rows]
+
+    def run(self) :
+        # plays all games to the end, returns the index of the winner pawn of each game
+        while True :
+            active = np.flatnonzero(self.winners < 0)
+            if (len(active) == 0) :
+                return self.winners
+            self.step(active)
+
+    def step(self, games) :
+        r = self.rng.random(len(games))
+        self.moveForward(games[r < 0.7])
+        rest = games[r >= 0.7]
+        canPlaceWall = ~self.pawnMoveFlags[rest] & (self.leftWalls[rest, self.turns[rest] % 2] > 0)
+        self.placeWalls(rest[canPlaceWall])
+        self.moveBackward(rest[~canPlaceWall])
+
+    def isOpen(self, games, cells, move) :
+        ways = self.openDown if VERTICAL_MOVES[move] else self.openRight
+        return ON_BOARD[move, cells] & ways[games, WAY_CELLS[move, cells]]
+
+    def validNextCells(self, games) :
+        # the valid next cells of the pawn of turn of each game, as in game.Game.getValidNextPositions:
+        # (cells, valid), both (n, 8), with two slots for each move to hold the two jumps beside the other pawn.
+        turnIndices = self.turns[games] % 2
+        cells = self.pawnCells[games, turnIndices]
+        otherCells = self.pawnCells[games, 1 - turnIndices]
+        nextCells = np.zeros((len(games), 8), dtype = int)
+        valid = np.zeros((len(games), 8), dtype = bool)
+        for move in range(4) :
+            isOpen = self.isOpen(games, cells, move)
+            blocked = isOpen & (cells + STEPS[move] == otherCells)
+            jumpStraight = self.isOpen(games, otherCells, move)
+            sideMove1, sideMove2 = SIDE_MOVES[move]
+            jumpSide1 = blocked & ~jumpStraight & self.isOpen(games, otherCells, sideMove1)
+            jumpSide2 = blocked & ~jumpStraight & self.isOpen(games, otherCells, sideMove2)
+            nextCells[:, 2 * move] = np.where(blocked, otherCells + np.where(jumpStraight, STEPS[move], STEPS[sideMove1]), cells + STEPS[move])
+            valid[:, 2 * move] = (isOpen & ~blocked) | (blocked & jumpStraight) | jumpSide1
+            nextCells[:, 2 * move + 1] = otherCells + STEPS[sideMove2]
+            valid[:, 2 * move + 1] = jumpSide2
+        nextCells[~valid] = 0
+        return nextCells, valid
+
+    def moveForward(self, games) :
+        # a step to one of the valid next cells nearest to the goal row
+        if (len(games) == 0) :
+            return
+        self.pawnMoveFlags[games] = False
+        nextCells, valid = self.validNextCells(games)
+        distances = self.distances[games[:, None], (self.turns[games] % 2)[:, None], nextCells]
+        scores = np.where(valid, distances + self.rng.random(valid.shape), np.inf)
+        self.movePawns(games, nextCells[np.arange(len(games)), np.argmin(scores, axis = 1)], valid.any(axis = 1))
+
+    def moveBackward(self, games) :
+        # a step to one of the valid next cells farther from the goal row, any valid next cell if there is none
+        if (len(games) == 0) :
+            return
+        self.pawnMoveFlags[games] = False
+        turnIndices = self.turns[games] % 2
+        nextCells, valid = self.validNextCells(games)
+        distances = self.distances[games[:, None], turnIndices[:, None], nextCells]
+        distance = self.distances[games, turnIndices, self.pawnCells[games, turnIndices]]
+        backwards = valid & (distances > distance[:, None])
+        candidates = np.where(backwards.any(axis = 1)[:, None], backwards, valid)
+        scores = candidates * (1 + self.rng.random(valid.shape))
+        self.movePawns(games, nextCells[np.arange(len(games)), np.argmax(scores, axis = 1)], valid.any(axis = 1))
+
+    def movePawns(self, games, cells, hasMove) :
+        # a pawn with no valid next cell (boxed in by walls and the other pawn) just passes
+        turnIndices = self.turns[games] % 2
+        games, cells, turnIndices, passes = games[hasMove], cells[hasMove], turnIndices[hasMove], games[~hasMove]
+        self.pawnCells[games, turnIndices] = cells
+        arrived = cells // 9 == self.goalRows[games, turnIndices]
+        self.winners[games[arrived]] = turnIndices[arrived]
+        self.turns[games] += 1
+        self.turns[passes] += 1
+
+    def probableWalls(self, games) :
+        # same heuristic as game.Game.probableValidNextWalls: (n, 128)
+        turns = self.turns[games]
+        turnIndices = turns % 2
+        probable = (turns >= 6)[:, None] & SIDE_WALLS
+        probable |= (turns >= 3)[:, None] & WALLS_BESIDE_CELL[self.pawnCells[games, 1 - turnIndices]]
+        probable |= ((turns >= 6) | self.hasWalls[games])[:, None] & WALLS_BESIDE_CELL[self.pawnCells[games, turnIndices]]
+        return probable & self.validWalls[games]
+
+    def placeWalls(self, games) :
+        # a probable wall chosen at random among the ones leaving a path to the goal row for both pawns.
+        # A game with no such wall does not move, and moves a pawn at its next step.
+        candidates = self.probableWalls(games)
+        while (len(games) > 0) :
+            hasCandidate = candidates.any(axis = 1)
+            self.pawnMoveFlags[games[~hasCandidate]] = True
+            games, candidates = games[hasCandidate], candidates[hasCandidate]
+            walls = np.argmax(candidates * (1 + self.rng.random(candidates.shape)), axis = 1)
+
+            openDown = self.openDown[games] & ~WALL_CLOSES[walls, 0]
+            openRight = self.openRight[games] & ~WALL_CLOSES[walls, 1]
+            distances = distancesToGoalRows(openDown, openRight, self.goalRows[games])
+            pawnDistances = distances[np.arange(len(games))[:, None], [0, 1], self.pawnCells[games]]
+            legal = (pawnDistances < INF_DISTANCE).all(axis = 1)
+
+            placed = games[legal]
+            turnIndices = self.turns[placed] % 2
+            self.openDown[placed] = openDown[legal]
+            self.openRight[placed] = openRight[legal]
+            self.distances[placed] = distances[legal]
+            self.validWalls[placed] &= ~WALL_INVALIDATES[walls[legal]]
+            self.leftWalls[placed, turnIndices] -= 1
+            self.hasWalls[placed] = True
+            self.turns[placed] += 1
+
+            candidates[np.flatnonzero(~legal), walls[~legal]] = False
+            games, candidates = games[~legal], candidates[~legal]
+
+
+def simulate(games, seed = None) :
+    # plays the games randomly to the end, returns the index of the winner pawn of each game
+    return BatchSimulator(games, seed).run()
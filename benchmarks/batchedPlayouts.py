@@ -0,0 +1,49 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import montecarloSearch as MCTS
+from common import positionGame, referenceSearch, referenceWinRateOf
+
+# Serial search with batched playouts (several playouts per selected leaf) for increasing batch sizes.
+# Selection, expansion, reconstruction of the leaf position and backpropagation are paid once per batch,
+# so playouts/s grows with the batch size, while the tree gets fewer distinct leaves for the same budget.
+# usage: python benchmarks/batchedPlayouts.py [--simulations N] [--batchSizes N ...] [--seeds N]
+
+
+def main() :
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--simulations", type=int, default=1000)
+    parser.add_argument("--referenceSimulations", type=int, default=4000)
+    parser.add_argument("--batchSizes", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--uctConst", type=float, default=0.4)
+    parser.add_argument("--seeds", type=int, default=3)
+    args = parser.parse_args()
+
+    game = positionGame("opening")
+    referenceMcts = referenceSearch(game, args.uctConst, args.referenceSimulations)
+
+    for batchSize in args.batchSizes :
+        totalSeconds = 0
+        referenceWinRates = 0
+        for seed in range(args.seeds) :
+            random.seed(seed)
+            mcts = MCTS.MonteCarloTreeSearch(game, args.uctConst, playoutBatchSize = batchSize)
+            d0 = time.perf_counter()
+            mcts.search(args.simulations)
+            totalSeconds += time.perf_counter() - d0
+            referenceWinRates += referenceWinRateOf(referenceMcts, mcts.selectBestMove()["move"])
+        print(json.dumps({
+            "batchSize": batchSize,
+            "playoutsPerSec": round(args.simulations * args.seeds / totalSeconds, 1),
+            "referenceWinRate": round(referenceWinRates / args.seeds, 3),
+        }))
+
+
+if __name__ == "__main__" :
+    main()
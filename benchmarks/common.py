@@ -0,0 +1,97 @@
+import os
+import sys
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import game as GAME
+import montecarloSearch as MCTS
+
+# Fixtures and helpers shared by the benchmark scripts: the fixed positions, a random move for random games,
+# and the reference search against which the move quality of a search is measured.
+# The scripts import this module only, never one another.
+
+REFERENCE_SEED = 12345
+
+POSITIONS = {
+    "opening": [
+        [[1, 4], None, None],
+        [[7, 4], None, None],
+        [None, [5, 3], None],
+        [[6, 4], None, None],
+        [[2, 4], None, None],
+        [None, None, [2, 4]],
+    ],
+    "midGame": [
+        [[1, 4], None, None],
+        [[7, 4], None, None],
+        [[2, 4], None, None],
+        [[6, 4], None, None],
+        [None, [5, 3], None],
+        [None, [2, 4], None],
+        [None, None, [5, 5]],
+        [None, None, [1, 3]],
+        [[2, 5], None, None],
+        [None, [3, 1], None],
+        [None, [6, 6], None],
+        [[6, 5], None, None],
+    ],
+    "lateGame": [
+        [[1, 4], None, None],
+        [[7, 4], None, None],
+        [None, [5, 3], None],
+        [None, [2, 4], None],
+        [None, [5, 5], None],
+        [None, [2, 2], None],
+        [None, None, [4, 1]],
+        [None, None, [3, 6]],
+        [None, [6, 0], None],
+        [None, [1, 6], None],
+        [None, None, [6, 7]],
+        [None, None, [0, 1]],
+        [None, [3, 2], None],
+        [None, [4, 6], None],
+        [None, [7, 4], None],
+        [None, [0, 4], None],
+        [[1, 3], None, None],
+        [[7, 3], None, None],
+    ],
+}
+
+def positionGame(name) :
+    game = GAME.Game(False)
+    for move in POSITIONS[name] :
+        if not game.doMove(move, True) :
+            raise ValueError(f"illegal move {move} in position {name}")
+    return game
+
+
+def randomMove(game) :
+    # a random wall (half of the time, if the pawn of turn has walls left) or else a random pawn move
+    if random.random() < 0.5 and game.getPawnAtTurn(returnTurn = True).numberOfLeftWalls > 0 :
+        walls = game.validNextWalls
+        candidates = ([[None, [row, col], None] for row, col in GAME.indicesOfValueIn2DArray(walls["horizontal"], True)]
+                      + [[None, None, [row, col]] for row, col in GAME.indicesOfValueIn2DArray(walls["vertical"], True)])
+        random.shuffle(candidates)
+        for move in candidates :
+            if game.isPossibleNextMove(move) :
+                game.doMove(move)
+                return
+    row, col = random.choice(game.getArrOfValidNextPositionTuples())
+    game.doMove([[row, col], None, None])
+
+
+def referenceSearch(game, uctConst, numOfSimulations) :
+    # a serial search with a larger budget than the searches measured against it, with a fixed seed
+    random.seed(REFERENCE_SEED)
+    referenceMcts = MCTS.MonteCarloTreeSearch(game, uctConst)
+    referenceMcts.search(numOfSimulations)
+    return referenceMcts
+
+
+def referenceWinRateOf(referenceMcts, move) :
+    # the win rate of the move in the reference tree, 0 if the reference search did not play it
+    for child in referenceMcts.root.children :
+        if MCTS.encodeMove(child.move) == MCTS.encodeMove(move) :
+            return child.winRate() if child.numSims > 0 else 0.0
+    return 0.0
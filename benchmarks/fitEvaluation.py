@@ -0,0 +1,97 @@
+import io
+import os
+import sys
+import json
+import random
+import argparse
+import contextlib
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import montecarloSearch as MCTS
+from common import POSITIONS, positionGame
+
+# Fits the weights of evaluatePosition (EVALUATION_TEMPO_STEPS, EVALUATION_WALL_STEPS, EVALUATION_STEP_WEIGHT)
+# by logistic regression: from each position of the suite, --games random playouts are played to the end,
+# and one position taken at random along each playout is labeled with its winner.
+# The features of a position are the difference of distances to the goal lines (pawn 1 minus pawn 0),
+# the pawn to move (1 for pawn 0, -1 for pawn 1) and the difference of walls left (pawn 0 minus pawn 1).
+# usage: python benchmarks/fitEvaluation.py [--games N] [--iterations N]
+
+
+def features(game) :
+    pawn0, pawn1 = game.board.pawns
+    distance0 = game.distancesToGoal[0][pawn0.position.row * 9 + pawn0.position.col]
+    distance1 = game.distancesToGoal[1][pawn1.position.row * 9 + pawn1.position.col]
+    return [distance1 - distance0, 1 if game.turn % 2 == 0 else -1, pawn0.numberOfLeftWalls - pawn1.numberOfLeftWalls]
+
+
+def samples(positionName, numOfGames) :
+    # (features, 1 if pawn 0 wins) of one random position along each of numOfGames random playouts
+    game = positionGame(positionName)
+    mcts = MCTS.MonteCarloTreeSearch(game, 0.4)
+    start = len(game.moveStack)
+    X = []
+    Y = []
+    for i in range(numOfGames) :
+        with contextlib.redirect_stdout(io.StringIO()) :
+            winner = mcts.playRandomly(game)
+        moves = game.getMoveHistory()[start:]
+        while (len(game.moveStack) > start) :
+            game.undoMove()
+        sampled = random.randrange(len(moves))
+        for move in moves[:sampled] :
+            game.doMove(move)
+        X.append(features(game))
+        Y.append(1 if winner == 0 else 0)
+        while (len(game.moveStack) > start) :
+            game.undoMove()
+    return X, Y
+
+
+def fitLogisticRegression(X, Y, iterations, learningRate) :
+    # weights and bias by gradient descent on the log loss
+    weights = np.zeros(X.shape[1])
+    bias = 0.0
+    for i in range(iterations) :
+        errors = 1 / (1 + np.exp(-(X @ weights + bias))) - Y
+        weights -= learningRate * X.T @ errors / len(Y)
+        bias -= learningRate * np.mean(errors)
+    return weights, bias
+
+
+def main() :
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=6000)
+    parser.add_argument("--iterations", type=int, default=100000)
+    parser.add_argument("--learningRate", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    X = []
+    Y = []
+    for positionName in POSITIONS :
+        positionX, positionY = samples(positionName, args.games)
+        X.extend(positionX)
+        Y.extend(positionY)
+    X = np.array(X, dtype=float)
+    Y = np.array(Y, dtype=float)
+
+    weights, bias = fitLogisticRegression(X, Y, args.iterations, args.learningRate)
+    probabilities = 1 / (1 + np.exp(-(X @ weights + bias)))
+    print(json.dumps({
+        "samples": len(Y),
+        "EVALUATION_STEP_WEIGHT": round(float(weights[0]), 3),
+        "EVALUATION_TEMPO_STEPS": round(float(weights[1] / weights[0]), 3),
+        "EVALUATION_WALL_STEPS": round(float(weights[2] / weights[0]), 3),
+        "bias": round(float(bias), 3),
+        "accuracy": round(float(np.mean((probabilities > 0.5) == Y)), 3),
+        "logLoss": round(float(-np.mean(Y * np.log(probabilities) + (1 - Y) * np.log(1 - probabilities))), 3),
+    }))
+
+
+if __name__ == "__main__" :
+    main()
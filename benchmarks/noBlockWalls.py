@@ -0,0 +1,83 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import game as GAME
+from common import POSITIONS, positionGame, randomMove
+
+# Legality of all the valid walls of a game.Game position:
+# "perWall" : a path search per wall cutting a shortest path (Game.testIfExistPathsToGoalLinesAfterCloseEdges)
+# "index"   : the verdicts of all the walls from one connectivity index of the position (game.getNoBlockWalls)
+# The verdicts of both are first checked to be the same on every position of --games random games.
+# usage: python benchmarks/noBlockWalls.py [--repeat N] [--games N]
+
+
+def validWalls(game) :
+    return [(direction, row, col) for direction in ("horizontal", "vertical")
+            for row, col in GAME.indicesOfValueIn2DArray(game.validNextWalls[direction], True)]
+
+
+def perWallVerdicts(game) :
+    verdicts = {}
+    for direction, row, col in validWalls(game) :
+        edges = (GAME.HORIZONTAL_WALL_EDGES if direction == "horizontal" else GAME.VERTICAL_WALL_EDGES)[row * 8 + col]
+        verdicts[(direction, row, col)] = game.testIfExistPathsToGoalLinesAfterCloseEdges(*edges)
+    return verdicts
+
+
+def indexVerdicts(game) :
+    noBlockWalls = GAME.getNoBlockWalls(game)
+    return {(direction, row, col): noBlockWalls[direction][row][col] for direction, row, col in validWalls(game)}
+
+
+def checkVerdicts(numOfGames, seed) :
+    random.seed(seed)
+    numOfPositions = 0
+    for i in range(numOfGames) :
+        game = GAME.Game(i % 2 == 0)
+        while game.winner is None and game.turn < 80 :
+            assert perWallVerdicts(game) == indexVerdicts(game), f"verdicts differ at turn {game.turn} of game {i}"
+            numOfPositions += 1
+            randomMove(game)
+    return numOfPositions
+
+
+def timeVerdicts(function, game, repeat) :
+    # the shortest paths are found again for each repeat, as for a new position
+    d0 = time.perf_counter()
+    for i in range(repeat) :
+        game._shortestPathWaysUpdated = False
+        function(game)
+    return (time.perf_counter() - d0) / repeat * 1e6
+
+
+def main() :
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--games", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    numOfPositions = checkVerdicts(args.games, args.seed)
+    print(json.dumps({"checkedPositions": numOfPositions}))
+
+    for positionName in POSITIONS :
+        game = positionGame(positionName)
+        perWall = timeVerdicts(perWallVerdicts, game, args.repeat)
+        index = timeVerdicts(indexVerdicts, game, args.repeat)
+        print(json.dumps({
+            "position": positionName,
+            "validWalls": len(validWalls(game)),
+            "usPerWall": round(perWall, 2),
+            "usIndex": round(index, 2),
+            "speedup": round(perWall / index, 2),
+        }))
+
+
+if __name__ == "__main__" :
+    main()
@@ -0,0 +1,126 @@
+import os
+import sys
+import copy
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import game as GAME
+import montecarloSearch as MCTS
+from common import POSITIONS, positionGame, randomMove
+
+# Wall legality of game.Game with the path existence searches:
+# "recursive" : the recursive depth first search with a fresh visited list per search (the original version)
+# "iterative" : Game.existPathToGoalRow, an explicit stack, epoch visited marks and moves toward the goal row first
+# The verdicts of both are first checked to be the same for every wall of --games random games.
+# usage: python benchmarks/pathExistence.py [--repeat N] [--games N]
+
+
+def depthFirstSearch(game, visited, currentCell, goalRow) :
+    if currentCell // 9 == goalRow :
+        return True
+    for move in range(4) :
+        if game.openEdges[GAME.NEIGHBOR_EDGES[currentCell][move]] :
+            nextCell = GAME.NEIGHBOR_CELLS[currentCell][move]
+            if not visited[nextCell] :
+                visited[nextCell] = True
+                if depthFirstSearch(game, visited, nextCell, goalRow) :
+                    return True
+    return False
+
+
+def recursiveExistPathsToGoalLineFor(game, pawn) :
+    return depthFirstSearch(game, [False] * 81, pawn.position.row * 9 + pawn.position.col, pawn.goalRow)
+
+
+def useRecursiveSearch(game) :
+    game.existPathsToGoalLineFor = lambda pawn : recursiveExistPathsToGoalLineFor(game, pawn)
+    return game
+
+
+def wallVerdicts(game) :
+    verdicts = []
+    for row in range(8) :
+        for col in range(8) :
+            edges = (GAME.HORIZONTAL_WALL_EDGES[row * 8 + col], GAME.VERTICAL_WALL_EDGES[row * 8 + col])
+            for edge1, edge2 in edges :
+                # searched for every wall, not only those cutting a shortest path
+                open1, open2 = game.openEdges[edge1], game.openEdges[edge2]
+                game.openEdges[edge1] = game.openEdges[edge2] = False
+                verdicts.append(game.existPathsToGoalLines())
+                game.openEdges[edge1], game.openEdges[edge2] = open1, open2
+    return verdicts
+
+
+def checkVerdicts(numOfGames, seed) :
+    random.seed(seed)
+    numOfPositions = 0
+    for i in range(numOfGames) :
+        game = GAME.Game(False)
+        while game.winner is None and game.turn < 60 :
+            iterative = wallVerdicts(game)
+            recursive = wallVerdicts(useRecursiveSearch(copy.deepcopy(game)))
+            assert iterative == recursive, f"verdicts differ at turn {game.turn} of game {i}"
+            numOfPositions += 1
+            randomMove(game)
+    return numOfPositions
+
+
+def timeSearches(game, repeat) :
+    # both pawns searched for every wall
+    d0 = time.perf_counter()
+    for i in range(repeat) :
+        wallVerdicts(game)
+    return (time.perf_counter() - d0) / (repeat * 128) * 1e6
+
+
+def isLegalWallMove(game, move) :
+    # the legality of a wall child added by expansion, searched for this wall alone
+    if (not move[1] is None) :
+        return game.testIfExistPathsToGoalLinesAfterPlaceHorizontalWall(move[1][0], move[1][1])
+    elif (not move[2] is None) :
+        return game.testIfExistPathsToGoalLinesAfterPlaceVerticalWall(move[2][0], move[2][1])
+    return True
+
+
+def timeExpansion(game, repeat) :
+    # expansion of the root, then the legality of every child searched one by one
+    searches = [MCTS.MonteCarloTreeSearch(game, 0.4) for i in range(repeat)]
+    d0 = time.perf_counter()
+    for mcts in searches :
+        mcts.expand(mcts.root)
+        for child in mcts.root.children :
+            isLegalWallMove(game, child.move)
+    return (time.perf_counter() - d0) / repeat * 1e6
+
+
+def main() :
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--games", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    numOfPositions = checkVerdicts(args.games, args.seed)
+    print(json.dumps({"checkedPositions": numOfPositions}))
+
+    for positionName in POSITIONS :
+        times = {}
+        for name, prepare in (("recursive", useRecursiveSearch), ("iterative", lambda game : game)) :
+            game = prepare(positionGame(positionName, "game"))
+            times[name] = (timeSearches(game, args.repeat), timeExpansion(game, args.repeat))
+        for i, workload in enumerate(("usPerWallSearch", "usPerExpansion")) :
+            print(json.dumps({
+                "position": positionName,
+                "workload": workload,
+                "recursive": round(times["recursive"][i], 2),
+                "iterative": round(times["iterative"][i], 2),
+                "speedup": round(times["recursive"][i] / times["iterative"][i], 2),
+            }))
+
+
+if __name__ == "__main__" :
+    main()
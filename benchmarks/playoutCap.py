@@ -0,0 +1,71 @@
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import montecarloSearch as MCTS
+from common import POSITIONS, positionGame
+
+# Playouts played to the end against playouts stopped after --plies plies and evaluated (maxPlayoutPlies):
+# the time of one playout (median and 99th percentile) on the positions of the suite,
+# and the best move of searches of --simulations simulations with each, from the same seeds.
+# usage: python benchmarks/playoutCap.py [--plies N] [--playouts N] [--simulations N] [--searches N]
+
+
+def playoutTimes(game, maxPlayoutPlies, numOfPlayouts, seed) :
+    random.seed(seed)
+    mcts = MCTS.MonteCarloTreeSearch(game, 0.4, maxPlayoutPlies = maxPlayoutPlies)
+    mcts.expand(mcts.root)
+    children = mcts.root.children
+    times = []
+    for i in range(numOfPlayouts) :
+        d0 = time.perf_counter()
+        mcts.playout(children[i % len(children)])
+        times.append(time.perf_counter() - d0)
+    times.sort()
+    return times
+
+
+def bestMove(game, maxPlayoutPlies, numOfSimulations, seed) :
+    random.seed(seed)
+    mcts = MCTS.MonteCarloTreeSearch(game, 0.4, maxPlayoutPlies = maxPlayoutPlies)
+    with contextlib.redirect_stdout(io.StringIO()) :
+        mcts.search(numOfSimulations)
+    return mcts.selectBestMove()["move"]
+
+
+def main() :
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--plies", type=int, default=12)
+    parser.add_argument("--playouts", type=int, default=2000)
+    parser.add_argument("--simulations", type=int, default=2000)
+    parser.add_argument("--searches", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for positionName in POSITIONS :
+        result = {"position": positionName}
+        for name, maxPlayoutPlies in (("full", None), ("capped", args.plies)) :
+            times = playoutTimes(positionGame(positionName), maxPlayoutPlies, args.playouts, args.seed)
+            result[name] = {
+                "p50us": round(times[len(times) // 2] * 1e6, 1),
+                "p99us": round(times[len(times) * 99 // 100] * 1e6, 1),
+                "playoutsPerSec": round(len(times) / sum(times), 1),
+            }
+        sameBestMoves = 0
+        for i in range(args.searches) :
+            full = bestMove(positionGame(positionName), None, args.simulations, args.seed + i)
+            capped = bestMove(positionGame(positionName), args.plies, args.simulations, args.seed + i)
+            sameBestMoves += MCTS.encodeMove(full) == MCTS.encodeMove(capped)
+        result["sameBestMoves"] = f"{sameBestMoves}/{args.searches}"
+        print(json.dumps(result))
+
+
+if __name__ == "__main__" :
+    main()
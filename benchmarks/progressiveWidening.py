@@ -0,0 +1,77 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import montecarloSearch as MCTS
+from common import positionGame, referenceSearch, referenceWinRateOf
+
+# Search with progressive widening against the search expanding every child at once, with the same budget.
+# Move quality is measured against a reference search (no widening) with a larger budget (see common.referenceSearch).
+# "expandMs" is the time spent in expand and widen, where the wall legality checks are done.
+# usage: python benchmarks/progressiveWidening.py [--coeffs C ...] [--position NAME] [--seeds N]
+
+
+def run(game, args, seed, wideningCoeff) :
+    random.seed(seed)
+    mcts = MCTS.MonteCarloTreeSearch(game, args.uctConst, wideningCoeff = wideningCoeff, wideningExponent = args.exponent)
+    expandSeconds = [0.0]
+    def timed(function) :
+        def timedFunction(*a) :
+            d0 = time.perf_counter()
+            result = function(*a)
+            expandSeconds[0] += time.perf_counter() - d0
+            return result
+        return timedFunction
+    mcts.expand = timed(mcts.expand)
+    mcts.widen = timed(mcts.widen)
+    d0 = time.perf_counter()
+    mcts.search(args.simulations)
+    return mcts, time.perf_counter() - d0, expandSeconds[0]
+
+
+def main() :
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--simulations", type=int, default=1000)
+    parser.add_argument("--referenceSimulations", type=int, default=4000)
+    parser.add_argument("--coeffs", type=float, nargs="+", default=[1.0, 2.0, 4.0])
+    parser.add_argument("--exponent", type=float, default=0.5)
+    parser.add_argument("--uctConst", type=float, default=0.4)
+    parser.add_argument("--position", default="opening")
+    parser.add_argument("--seeds", type=int, default=3)
+    args = parser.parse_args()
+
+    game = positionGame(args.position)
+    referenceMcts = referenceSearch(game, args.uctConst, args.referenceSimulations)
+    referenceMove = referenceMcts.selectBestMove()["move"]
+
+    for wideningCoeff in [None] + args.coeffs :
+        totalSeconds = 0
+        totalExpandSeconds = 0
+        agreements = 0
+        referenceWinRates = 0
+        numOfNodes = 0
+        for seed in range(args.seeds) :
+            mcts, elapsed, expandSeconds = run(game, args, seed, wideningCoeff)
+            move = mcts.selectBestMove()["move"]
+            totalSeconds += elapsed
+            totalExpandSeconds += expandSeconds
+            numOfNodes += len(mcts.store)
+            agreements += MCTS.encodeMove(move) == MCTS.encodeMove(referenceMove)
+            referenceWinRates += referenceWinRateOf(referenceMcts, move)
+        print(json.dumps({
+            "wideningCoeff": wideningCoeff,
+            "playoutsPerSec": round(args.simulations * args.seeds / totalSeconds, 1),
+            "expandMs": round(totalExpandSeconds / args.seeds * 1000, 1),
+            "nodes": numOfNodes // args.seeds,
+            "agreement": round(agreements / args.seeds, 2),
+            "referenceWinRate": round(referenceWinRates / args.seeds, 3),
+        }), flush = True)
+
+
+if __name__ == "__main__" :
+    main()
@@ -0,0 +1,57 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import montecarloSearch as MCTS
+from common import positionGame
+
+# Playout throughput of root parallel search for an increasing number of worker processes.
+# usage: python benchmarks/rootParallelScaling.py [--simulations N] [--maxWorkers N]
+
+
+def main() :
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--simulations", type=int, default=2000)
+    parser.add_argument("--maxWorkers", type=int, default=os.cpu_count())
+    parser.add_argument("--uctConst", type=float, default=0.4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    numsOfWorkers = []
+    numOfWorkers = 1
+    while numOfWorkers < args.maxWorkers :
+        numsOfWorkers.append(numOfWorkers)
+        numOfWorkers *= 2
+    numsOfWorkers.append(args.maxWorkers)
+
+    baseline = None
+    for numOfWorkers in numsOfWorkers :
+        random.seed(args.seed)
+        mcts = MCTS.MonteCarloTreeSearch(positionGame("opening"), args.uctConst)
+        d0 = time.perf_counter()
+        if numOfWorkers > 1 :
+            mcts.searchRootParallel(args.simulations, numOfWorkers, args.seed)
+        else :
+            mcts.search(args.simulations)
+        elapsed = time.perf_counter() - d0
+
+        playoutsPerSec = mcts.totalNumOfSimulations / elapsed
+        if baseline is None :
+            baseline = playoutsPerSec
+        print(json.dumps({
+            "workers": numOfWorkers,
+            "playouts": mcts.totalNumOfSimulations,
+            "seconds": round(elapsed, 3),
+            "playoutsPerSec": round(playoutsPerSec, 1),
+            "speedup": round(playoutsPerSec / baseline, 2),
+            "bestMove": mcts.selectBestMove()["move"],
+        }))
+
+
+if __name__ == "__main__" :
+    main()
@@ -0,0 +1,100 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import game as GAME
+import montecarloSearch as MCTS
+from common import positionGame
+
+# Per call cost of the random shortest path search, before (list based, queue.pop(0), a new
+# PawnPosition per visited cell) and after (preallocated flat arrays, integer cells).
+# Both are run with the same random seed and their dist/prev/goal are checked to be identical.
+# usage: python benchmarks/shortestPathBfs.py [--calls N]
+
+
+def listBasedRandomShortestPathToGoal(pawn, game) :
+    # getRandomShortestPathToGoal before the flat array version
+    visited = [[False] * 9 for _ in range(9)]
+    dist = [[np.inf] * 9 for _ in range(9)]
+    prev = [[None] * 9 for _ in range(9)]
+    pawnMoveTuples = GAME.MOVES[:]
+    random.shuffle(pawnMoveTuples)
+    queue = []
+
+    visited[pawn.position.row][pawn.position.col] = True
+    dist[pawn.position.row][pawn.position.col] = 0
+    queue.append(pawn.position)
+    while (len(queue) > 0) :
+        position = queue.pop(0)
+        if (position.row == pawn.goalRow) :
+            return [dist, prev, position]
+
+        for i in range(len(pawnMoveTuples)) :
+            if (game.isOpenWay(position.row, position.col, pawnMoveTuples[i])) :
+                nextPosition = position.newPosition(pawnMoveTuples[i])
+                if not visited[nextPosition.row][nextPosition.col] :
+                    dist[nextPosition.row][nextPosition.col] = dist[position.row][position.col] + 1
+                    prev[nextPosition.row][nextPosition.col] = position
+                    visited[nextPosition.row][nextPosition.col] = True
+                    queue.append(nextPosition)
+
+    return [dist, prev, None]
+
+
+def getRandomShortestPathToGoal(pawn, game) :
+    # the flat array version with the 2D results of the list based one
+    goalCell = MCTS.randomShortestPathToGoalCell(pawn, game)
+    dist, prev, queue = MCTS.getBfsBuffers()
+    dist2D = [[d if d >= 0 else np.inf for d in dist[row * 9 : row * 9 + 9]] for row in range(9)]
+    prev2D = [[MCTS.CELL_POSITIONS_OR_NONE[p] for p in prev[row * 9 : row * 9 + 9]] for row in range(9)]
+    return [dist2D, prev2D, MCTS.CELL_POSITIONS_OR_NONE[goalCell]]
+
+
+def asComparable(result) :
+    dist, prev, goalPosition = result
+    toTuple = lambda position : None if position is None else (position.row, position.col)
+    return (dist, [[toTuple(p) for p in row] for row in prev], toTuple(goalPosition))
+
+
+def timePerCall(function, game, calls, seed) :
+    random.seed(seed)
+    d0 = time.perf_counter()
+    for i in range(calls) :
+        function(game.board.pawns[i % 2], game)
+    return (time.perf_counter() - d0) / calls
+
+
+def main() :
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    game = positionGame("opening")
+    for i in range(200) :
+        pawn = game.board.pawns[i % 2]
+        random.seed(args.seed + i)
+        before = asComparable(listBasedRandomShortestPathToGoal(pawn, game))
+        random.seed(args.seed + i)
+        after = asComparable(getRandomShortestPathToGoal(pawn, game))
+        assert before == after, "results differ for seed %d" % (args.seed + i)
+
+    for name, function in [("before", listBasedRandomShortestPathToGoal),
+                           ("after", getRandomShortestPathToGoal),
+                           ("afterFlat", MCTS.randomShortestPathToGoalCell)] :
+        print(json.dumps({
+            "implementation": name,
+            "calls": args.calls,
+            "usPerCall": round(timePerCall(function, game, args.calls, args.seed) * 1e6, 2),
+        }))
+
+
+if __name__ == "__main__" :
+    main()
@@ -0,0 +1,104 @@
+import os
+import sys
+import copy
+import json
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import game as GAME
+import montecarloSearch as MCTS
+
+# Per call cost of chooseShortestPathNextPawnPositionsThoroughly, mostly on adjacent pawns (jumps):
+# "deepcopy"       : a copy of the game per valid next position, moved and searched (the original version)
+# "moveAndUndo"    : the pawn moved, searched and moved back per valid next position
+# "distanceFields" : one lookup per valid next position in the distance fields kept by the game
+# All of them are checked to return the same positions.
+# usage: python benchmarks/shortestPathNextPositions.py [--calls N]
+
+# (pawn of turn, other pawn, walls, turn): pawn 0 goes to row 8, pawn 1 to row 0
+CASES = {
+    "straightJump": ([4, 4], [5, 4], [], 0),
+    "sideJumps": ([4, 4], [5, 4], [[None, [5, 3], None]], 0),
+    "sideJumpBesideWall": ([4, 4], [5, 4], [[None, [5, 3], None], [None, None, [4, 4]]], 0),
+    "jumpAtBoardEdge": ([7, 4], [8, 4], [], 0),
+    "jumpTowardGoal": ([5, 2], [4, 2], [[None, [3, 1], None]], 1),
+    "notAdjacent": ([2, 4], [6, 4], [[None, [5, 3], None], [None, None, [2, 4]]], 0),
+}
+
+
+def casePosition(case) :
+    pawnCell, otherCell, walls, turn = case
+    game = GAME.Game(False)
+    for wall in walls :
+        game.doMove(wall)
+    game.setTurn(turn)
+    game.getPawnAtTurn(returnTurn = True).position = GAME.PawnPosition(*pawnCell)
+    game.getPawnAtTurn(returnTurn = False).position = GAME.PawnPosition(*otherCell)
+    game.moveStack = []
+    game.hash = game.computeHash()
+    return game
+
+
+def shortestDistanceBySearch(pawn, game) :
+    goalCell = MCTS.randomShortestPathToGoalCell(pawn, game)
+    return np.inf if goalCell < 0 else MCTS.getBfsBuffers()[0][goalCell]
+
+
+def deepcopyVersion(game) :
+    valids = game.getArrOfValidNextPositionTuples()
+    distances = []
+    for row, col in valids :
+        clonedGame = copy.deepcopy(game)
+        clonedGame.movePawn(row, col)
+        distances.append(shortestDistanceBySearch(clonedGame.getPawnAtTurn(returnTurn = False), clonedGame))
+    return [GAME.PawnPosition(*valids[i]) for i, d in enumerate(distances) if d == np.min(distances)]
+
+
+def moveAndUndoVersion(game) :
+    valids = game.getArrOfValidNextPositionTuples()
+    distances = []
+    for row, col in valids :
+        game.movePawn(row, col)
+        distances.append(shortestDistanceBySearch(game.getPawnAtTurn(returnTurn = False), game))
+        game.undoMove()
+    minDistance = min(distances)
+    return [GAME.PawnPosition(*valids[i]) for i, d in enumerate(distances) if d == minDistance]
+
+
+IMPLEMENTATIONS = [
+    ("deepcopy", deepcopyVersion),
+    ("moveAndUndo", moveAndUndoVersion),
+    ("distanceFields", MCTS.chooseShortestPathNextPawnPositionsThoroughly),
+]
+
+
+def main() :
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+
+    for caseName, case in CASES.items() :
+        game = casePosition(case)
+        results = [sorted((p.row, p.col) for p in function(game)) for name, function in IMPLEMENTATIONS]
+        assert all(result == results[0] for result in results), "results differ for " + caseName
+
+        for name, function in IMPLEMENTATIONS :
+            calls = args.calls // 10 if name == "deepcopy" else args.calls
+            d0 = time.perf_counter()
+            for i in range(calls) :
+                function(game)
+            elapsed = time.perf_counter() - d0
+            print(json.dumps({
+                "case": caseName,
+                "implementation": name,
+                "nextPositions": results[0],
+                "usPerCall": round(elapsed / calls * 1e6, 2),
+            }))
+
+
+if __name__ == "__main__" :
+    main()
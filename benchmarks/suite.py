@@ -0,0 +1,180 @@
+import os
+import sys
+import io
+import json
+import time
+import random
+import argparse
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import game as GAME
+import montecarloSearch as MCTS
+from common import POSITIONS, positionGame
+
+# Benchmark suite of the search engine.
+# Every workload runs on fixed positions with fixed seeds,
+# and prints one JSON line per result: {"name", "value", "unit", "higherIsBetter"}.
+# --save writes the results as a baseline, with the scale of the run (--quick or not) and the seed.
+# --baseline compares against one and exits with 1 when a result is worse than the baseline by more than --tolerance;
+# it refuses (exit 2) a baseline of another scale or seed, since the workloads depend on them.
+# usage: python benchmarks/suite.py [--quick] [--only WORKLOAD ...] [--save FILE] [--baseline FILE]
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+def timeIt(function, repeat) :
+    d0 = time.perf_counter()
+    for i in range(repeat) :
+        function(i)
+    return time.perf_counter() - d0
+
+
+def playouts(positionName, scale, seed) :
+    game = positionGame(positionName)
+    random.seed(seed)
+    mcts = MCTS.MonteCarloTreeSearch(game, 0.4)
+    mcts.expand(mcts.root)
+    # wall children are added unchecked: only the legal ones are played out, as in a search
+    children = [child for child in mcts.root.children if mcts.verify(child)]
+    n = 200 * scale
+    elapsed = timeIt(lambda i : mcts.playout(children[i % len(children)]), n)
+    return n / elapsed, "playouts/s", True
+
+
+def expansion(positionName, scale, seed) :
+    game = positionGame(positionName)
+    random.seed(seed)
+    n = 20 * scale
+    searches = [MCTS.MonteCarloTreeSearch(game, 0.4) for i in range(n)]
+    expandRoot = lambda i : searches[i].expand(searches[i].root)
+    return timeIt(expandRoot, n) / n * 1e6, "us/node", False
+
+
+def validNextPositions(positionName, scale, seed) :
+    game = positionGame(positionName)
+    n = 2000 * scale
+    def getValidNextPositions(i) :
+        game._validNextPositionsUpdated = False
+        game.getValidNextPositions()
+    return n / timeIt(getValidNextPositions, n), "calls/s", True
+
+
+def isOpenWay(positionName, scale, seed) :
+    game = positionGame(positionName)
+    n = 20 * scale
+    isOpenWay = game.isOpenWay
+    moves = GAME.MOVES
+    def allWays(i) :
+        for row in range(9) :
+            for col in range(9) :
+                for move in moves :
+                    isOpenWay(row, col, move)
+    return n * 81 * len(moves) / timeIt(allWays, n), "calls/s", True
+
+
+def wallLegality(positionName, scale, seed) :
+    game = positionGame(positionName)
+    validNextWalls = game.validNextWalls
+    horizontals = GAME.indicesOfValueIn2DArray(validNextWalls["horizontal"], True)
+    verticals = GAME.indicesOfValueIn2DArray(validNextWalls["vertical"], True)
+    n = 2 * scale
+    def testAll(i) :
+        for row, col in horizontals :
+            game.testIfExistPathsToGoalLinesAfterPlaceHorizontalWall(row, col)
+        for row, col in verticals :
+            game.testIfExistPathsToGoalLinesAfterPlaceVerticalWall(row, col)
+    return n * (len(horizontals) + len(verticals)) / timeIt(testAll, n), "walls/s", True
+
+
+def chooseNextMoveLatency(positionName, scale, seed) :
+    game = positionGame(positionName)
+    random.seed(seed)
+    with contextlib.redirect_stdout(io.StringIO()) :
+        d0 = time.perf_counter()
+        MCTS.chooseNextMove(game, 0.4, 100 * scale)
+        elapsed = time.perf_counter() - d0
+    return elapsed * 1000, "ms", False
+
+
+WORKLOADS = {
+    "playouts": playouts,
+    "expansion": expansion,
+    "validNextPositions": validNextPositions,
+    "isOpenWay": isOpenWay,
+    "wallLegality": wallLegality,
+    "chooseNextMove": chooseNextMoveLatency,
+}
+
+
+def runSuite(workloadNames, scale, seed) :
+    results = []
+    for workloadName in workloadNames :
+        for positionName in POSITIONS :
+            value, unit, higherIsBetter = WORKLOADS[workloadName](positionName, scale, seed)
+            result = {
+                "name": f"{workloadName}/{positionName}",
+                "value": round(value, 2),
+                "unit": unit,
+                "higherIsBetter": higherIsBetter,
+            }
+            print(json.dumps(result), flush = True)
+            results.append(result)
+    return results
+
+
+def compareWithBaseline(results, baselineResults, tolerance) :
+    # returns the names of the results worse than the baseline by more than the tolerance
+    baseline = {result["name"]: result for result in baselineResults}
+    regressions = []
+    for result in results :
+        if not result["name"] in baseline :
+            continue
+        baselineValue = baseline[result["name"]]["value"]
+        if result["higherIsBetter"] :
+            ratio = result["value"] / baselineValue
+        else :
+            ratio = baselineValue / result["value"]
+        print(json.dumps({"name": result["name"], "baseline": baselineValue, "value": result["value"], "ratio": round(ratio, 3)}))
+        if ratio < 1 - tolerance :
+            regressions.append(result["name"])
+    return regressions
+
+
+def main() :
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--only", nargs = "+", choices = list(WORKLOADS), default = list(WORKLOADS))
+    parser.add_argument("--quick", action = "store_true", help = "smaller repeat counts, for a smoke run")
+    parser.add_argument("--seed", type = int, default = 0)
+    parser.add_argument("--save", nargs = "?", const = DEFAULT_BASELINE, default = None)
+    parser.add_argument("--baseline", nargs = "?", const = DEFAULT_BASELINE, default = None)
+    parser.add_argument("--tolerance", type = float, default = 0.2)
+    args = parser.parse_args()
+
+    scale = 1 if args.quick else 5
+
+    baseline = None
+    if not args.baseline is None :
+        with open(args.baseline) as f :
+            baseline = json.load(f)
+        if not isinstance(baseline, dict) or baseline.get("scale") != scale or baseline.get("seed") != args.seed :
+            recorded = {"scale": baseline.get("scale"), "seed": baseline.get("seed")} if isinstance(baseline, dict) else None
+            print(json.dumps({"error": "baseline of another scale or seed, save it again", "baseline": recorded,
+                              "run": {"scale": scale, "seed": args.seed}}))
+            sys.exit(2)
+
+    results = runSuite(args.only, scale, args.seed)
+
+    if not args.save is None :
+        with open(args.save, "w") as f :
+            json.dump({"scale": scale, "seed": args.seed, "results": results}, f, indent = 1)
+
+    if not baseline is None :
+        regressions = compareWithBaseline(results, baseline["results"], args.tolerance)
+        if len(regressions) > 0 :
+            print(json.dumps({"regressions": regressions}))
+            sys.exit(1)
+
+
+if __name__ == "__main__" :
+    main()
@@ -0,0 +1,90 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import game as GAME
+import montecarloSearch as MCTS
+from common import positionGame
+
+# Cost of one maxUCTChild call on wide roots (the initial position has 131 children),
+# before (a Python loop calling uct() with NumPy scalar functions per child)
+# and after (vectorized NumPy over the child block, or the cached log loop for narrow nodes).
+# usage: python benchmarks/uctSelection.py [--calls N] [--simulations N]
+
+
+def scalarMaxUCTChild(store, index) :
+    # maxUCTChild before vectorization
+    first = store.firstChild[index]
+    maxUCT = -np.inf
+    for child in range(first, first + store.numChildren[index]) :
+        numSims = store.sims[child]
+        if (numSims == 0) :
+            uct = np.inf
+        else :
+            uct = (store.wins[child] / numSims) + np.sqrt((store.uctConst * np.log(store.sims[index])) / numSims)
+        if (uct > maxUCT) :
+            maxUCT = uct
+            maxUCTChildren = [child]
+        elif (uct == maxUCT) :
+            maxUCTChildren.append(child)
+    return random.choice(maxUCTChildren)
+
+
+def loopMaxUCTChild(store, index) :
+    # the cached log loop, also for wide nodes
+    minChildren = MCTS.NodeStore.MIN_CHILDREN_TO_VECTORIZE
+    MCTS.NodeStore.MIN_CHILDREN_TO_VECTORIZE = 1 << 30
+    try :
+        return store.maxUCTChild(index)
+    finally :
+        MCTS.NodeStore.MIN_CHILDREN_TO_VECTORIZE = minChildren
+
+
+def searchedRoot(game, simulations, seed) :
+    random.seed(seed)
+    mcts = MCTS.MonteCarloTreeSearch(game, 0.4)
+    mcts.search(simulations)
+    return mcts
+
+
+def main() :
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=5000)
+    parser.add_argument("--simulations", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    positions = {
+        "initial": GAME.Game(False),
+        "opening": positionGame("opening"),
+        "midGame": positionGame("midGame"),
+    }
+    for positionName, game in positions.items() :
+        mcts = searchedRoot(game, args.simulations, args.seed)
+        store = mcts.store
+        index = mcts.root.index
+        for name, function in [("before", scalarMaxUCTChild),
+                               ("loop", loopMaxUCTChild),
+                               ("after", store.maxUCTChild.__func__)] :
+            random.seed(args.seed)
+            d0 = time.perf_counter()
+            for i in range(args.calls) :
+                function(store, index)
+            elapsed = time.perf_counter() - d0
+            print(json.dumps({
+                "position": positionName,
+                "children": store.numChildren[index],
+                "implementation": name,
+                "usPerCall": round(elapsed / args.calls * 1e6, 2),
+            }))
+
+
+if __name__ == "__main__" :
+    main()
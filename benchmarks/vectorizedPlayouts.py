@@ -0,0 +1,58 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+import montecarloSearch as MCTS
+import batchSimulator as BATCH_SIMULATOR
+from common import positionGame, POSITIONS
+
+# Playouts of batchSimulator (all games of a batch at once) against the playouts of MonteCarloTreeSearch.simulate
+# (one game after another), from the same positions: throughput, and win rate of pawn 0 to check the policies agree.
+# usage: python benchmarks/vectorizedPlayouts.py [--batchSizes N ...] [--playouts N]
+
+
+def main() :
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batchSizes", type=int, nargs="+", default=[1, 16, 64, 256])
+    parser.add_argument("--playouts", type=int, default=512)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for positionName in POSITIONS :
+        game = positionGame(positionName)
+        random.seed(args.seed)
+        mcts = MCTS.MonteCarloTreeSearch(game, 0.4)
+        d0 = time.perf_counter()
+        numOfWins, nodePawnIndex = mcts.simulate(mcts.root, numOfPlayouts = args.playouts)
+        elapsed = time.perf_counter() - d0
+        print(json.dumps({
+            "position": positionName,
+            "simulator": "simulate",
+            "playoutsPerSec": round(args.playouts / elapsed, 1),
+            "winRateOfPawn0": round(numOfWins[0] / args.playouts, 3),
+        }))
+
+        for batchSize in args.batchSizes :
+            random.seed(args.seed)
+            winners = []
+            d0 = time.perf_counter()
+            for i in range(0, args.playouts, batchSize) :
+                winners.append(BATCH_SIMULATOR.simulate([game] * min(batchSize, args.playouts - i)))
+            elapsed = time.perf_counter() - d0
+            print(json.dumps({
+                "position": positionName,
+                "simulator": "batchSimulator",
+                "batchSize": batchSize,
+                "playoutsPerSec": round(args.playouts / elapsed, 1),
+                "winRateOfPawn0": round(float(np.mean(np.concatenate(winners) == 0)), 3),
+            }))
+
+
+if __name__ == "__main__" :
+    main()
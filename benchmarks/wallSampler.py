@@ -0,0 +1,58 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import montecarloSearch as MCTS
+from common import POSITIONS, positionGame
+
+# Cost of a wall decision of playouts (chooseProbableNextWall) on the positions of the suite,
+# with the number of candidates which needed a path search, of those rejected for blocking a path,
+# and of connectivity indexes built to draw again among the legal walls.
+# Each decision is made as on a new position: the shortest paths are found again.
+# usage: python benchmarks/wallSampler.py [--decisions N]
+
+
+def main() :
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--decisions", type=int, default=3000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for positionName in POSITIONS :
+        game = positionGame(positionName)
+        counts = {"searched": 0, "rejected": 0, "indexed": 0}
+        isPossibleNextMove = game.isPossibleNextMove
+        def countingIsPossibleNextMove(move) :
+            isPossible = isPossibleNextMove(move)
+            counts["searched"] += 1
+            counts["rejected"] += not isPossible
+            return isPossible
+        game.isPossibleNextMove = countingIsPossibleNextMove
+        noBlockWalls = game.noBlockWalls
+        def countingNoBlockWalls() :
+            counts["indexed"] += 1
+            return noBlockWalls()
+        game.noBlockWalls = countingNoBlockWalls
+
+        random.seed(args.seed)
+        d0 = time.perf_counter()
+        for i in range(args.decisions) :
+            game.setTurn(game.turn)
+            MCTS.chooseProbableNextWall(game)
+        elapsed = time.perf_counter() - d0
+        print(json.dumps({
+            "position": positionName,
+            "usPerDecision": round(elapsed / args.decisions * 1e6, 2),
+            "searchedPerDecision": round(counts["searched"] / args.decisions, 3),
+            "rejectedPerDecision": round(counts["rejected"] / args.decisions, 3),
+            "indexedPerDecision": round(counts["indexed"] / args.decisions, 3),
+        }))
+
+
+if __name__ == "__main__" :
+    main()
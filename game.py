@@ -1,7 +1,6 @@
 from typing import final
-import copy
-from collections import deque
-import numpy as np
+import random
+import heapq
 
 # Possible positions of a pawn
 MOVE_UP: final = [-1, 0]
@@ -10,6 +9,78 @@ MOVE_LEFT : final= [0, -1]
 MOVE_RIGHT: final = [0, 1]
 MOVES = [MOVE_UP, MOVE_LEFT, MOVE_RIGHT, MOVE_DOWN]
 
+# Adjacency of the 9x9 grid, on flat cell indices (row * 9 + col).
+# Edges are the ways between adjacent cells:
+# the way openWays["upDown"][row][col] is edge row * 9 + col,
+# the way openWays["leftRight"][row][col] is edge 72 + row * 8 + col,
+# and CLOSED_EDGE stands for the ways off the board, which are never open.
+# For each cell and each move (index in MOVES), NEIGHBOR_CELLS holds the adjacent cell (-1 off the board)
+# and NEIGHBOR_EDGES the edge to it, so a move is possible against walls if openEdges[NEIGHBOR_EDGES[cell][move]].
+NUM_EDGES = 144
+CLOSED_EDGE = NUM_EDGES
+NEIGHBOR_CELLS = []
+NEIGHBOR_EDGES = []
+for _cell in range(81) :
+    _row, _col = divmod(_cell, 9)
+    NEIGHBOR_CELLS.append([_cell - 9 if _row > 0 else -1, _cell - 1 if _col > 0 else -1,
+                           _cell + 1 if _col < 8 else -1, _cell + 9 if _row < 8 else -1])
+    NEIGHBOR_EDGES.append([_cell - 9 if _row > 0 else CLOSED_EDGE, 72 + _row * 8 + _col - 1 if _col > 0 else CLOSED_EDGE,
+                           72 + _row * 8 + _col if _col < 8 else CLOSED_EDGE, _cell if _row < 8 else CLOSED_EDGE])
+
+# index in MOVES of a move tuple [dRow, dCol], at (dRow + 1) * 3 + dCol + 1
+MOVE_INDEX_OF_DELTA = [None, 0, None, 1, None, 2, None, 3, None]
+# moves to the sides of each move, for jumping beside the other pawn
+SIDE_MOVES = [(1, 2), (0, 3), (0, 3), (1, 2)]
+
+# edges closed by the wall at (row, col), at row * 8 + col
+HORIZONTAL_WALL_EDGES = [(_w // 8 * 9 + _w % 8, _w // 8 * 9 + _w % 8 + 1) for _w in range(64)]
+VERTICAL_WALL_EDGES = [(72 + _w // 8 * 8 + _w % 8, 72 + (_w // 8 + 1) * 8 + _w % 8) for _w in range(64)]
+# the two cells of each edge
+EDGE_CELLS = [(_edge, _edge + 9) for _edge in range(72)] + [(_edge - 72 + (_edge - 72) // 8, _edge - 72 + (_edge - 72) // 8 + 1) for _edge in range(72, NUM_EDGES)]
+# virtual nodes of the goal lines in the connectivity index of getNoBlockWalls, for goal row 0 and 8
+GOAL_NODES = {0: 81, 8: 82}
+# order of the moves tried by existPathToGoalRow for each goal row (0 or 8):
+# the move toward the goal row is pushed last, so it is searched first
+MOVE_ORDER_TOWARD_ROW = {0: (3, 1, 2, 0), 8: (0, 1, 2, 3)}
+# walls closing each edge: ("horizontal" or "vertical", row, col)
+WALLS_CLOSING_EDGE = [[] for _edge in range(NUM_EDGES)]
+for _w in range(64) :
+    for _edge in HORIZONTAL_WALL_EDGES[_w] :
+        WALLS_CLOSING_EDGE[_edge].append(("horizontal", _w // 8, _w % 8))
+    for _edge in VERTICAL_WALL_EDGES[_w] :
+        WALLS_CLOSING_EDGE[_edge].append(("vertical", _w // 8, _w % 8))
+
+# Sets of walls as masks: bit row * 8 + col of a 64 bit integer for the wall at (row, col).
+ALL_WALLS = (1 << 64) - 1
+# walls which become invalid after placing each wall: (horizontal mask, vertical mask)
+HORIZONTAL_WALL_INVALIDATES = []
+VERTICAL_WALL_INVALIDATES = []
+for _w in range(64) :
+    _row, _col = divmod(_w, 8)
+    HORIZONTAL_WALL_INVALIDATES.append(((1 << _w) | (1 << (_w - 1) if _col > 0 else 0) | (1 << (_w + 1) if _col < 7 else 0), 1 << _w))
+    VERTICAL_WALL_INVALIDATES.append((1 << _w, (1 << _w) | (1 << (_w - 8) if _row > 0 else 0) | (1 << (_w + 8) if _row < 7 else 0)))
+# leftmost and rightmost horizontal walls
+SIDE_HORIZONTAL_WALLS = 0
+for _row in range(8) :
+    SIDE_HORIZONTAL_WALLS |= (1 << (_row * 8)) | (1 << (_row * 8 + 7))
+# walls closing each edge as masks: (horizontal mask, vertical mask)
+EDGE_CLOSING_WALLS_MASKS = []
+for _edge in range(NUM_EDGES) :
+    _masks = [0, 0]
+    for _direction, _row, _col in WALLS_CLOSING_EDGE[_edge] :
+        _masks[_direction == "vertical"] |= 1 << (_row * 8 + _col)
+    EDGE_CLOSING_WALLS_MASKS.append(tuple(_masks))
+# WALLS_BESIDE_CELL, walls beside a pawn standing on each cell, is at the end (see setWallsBesidePawn)
+
+# Zobrist keys for hashing positions.
+# The seed is fixed so that hashes are the same in every process and every run.
+_zobristRandom = random.Random(0x5A0B)
+ZOBRIST_PAWN = [[_zobristRandom.getrandbits(64) for cell in range(81)] for pawnIndex in range(2)]
+ZOBRIST_HORIZONTAL_WALL = [_zobristRandom.getrandbits(64) for wall in range(64)]
+ZOBRIST_VERTICAL_WALL = [_zobristRandom.getrandbits(64) for wall in range(64)]
+ZOBRIST_LEFT_WALLS = [[_zobristRandom.getrandbits(64) for numberOfLeftWalls in range(11)] for pawnIndex in range(2)]
+ZOBRIST_TURN = _zobristRandom.getrandbits(64)
+
 def initialBoard (numRows, numCols, value):
     array = []
     for i in range(numRows):
@@ -82,12 +153,24 @@ class Game :
         self.winner = None
         self.turn = None
         self.validNextWalls = None
-        self._probableNextWalls = None
+        self.validNextWallsMasks = None
+        self.numOfPlacedWalls = None
+        self._probableValidNextWallsMasks = None
         self._probableValidNextWalls = None
         self._probableValidNextWallsUpdated = None
         self.openWays = None
+        self.openEdges = None
         self._validNextPositions = None
         self._validNextPositionsUpdated = None
+        self.moveStack = None
+        self.hash = None
+        self._shortestPathWays = None
+        self._shortestPathWaysUpdated = False
+        self.distancesToGoal = None
+        self._visitedEpochs = None
+        self._searchEpoch = None
+        self._noBlockWalls = None
+        self._noBlockWallsUpdated = False
         if  not forClone : 
             self.board =  Board(isHumanPlayerFirst)
             self.winner = None
@@ -96,26 +179,48 @@ class Game :
             # horizontal, vertical: each is a 8 by 8 2D bool array True indicates valid location, false indicates not valid wall location.
             # this should be only updated each time placing a wall 
             self.validNextWalls = {"horizontal": initialBoard(8, 8, True), "vertical": initialBoard(8, 8, True)}
+            # the same valid walls as masks: [horizontal mask, vertical mask]
+            self.validNextWallsMasks = [ALL_WALLS, ALL_WALLS]
+            self.numOfPlacedWalls = 0
 
-            # probable next probable walls: it's for expansion phase of Monte Carlo Tree Search.
-            self._probableNextWalls = {"horizontal": initialBoard(8, 8, False), "vertical": initialBoard(8, 8, False)}
+            # probable next walls: it's for playouts of Monte Carlo Tree Search (see probableValidNextWallsMasks).
+            # the 2D arrays are made from the masks when first needed.
+            self._probableValidNextWallsMasks = None
             self._probableValidNextWalls = None
             self._probableValidNextWallsUpdated = False
 
             # whether ways to adjacency is blocked (not open) or not blocked (open) by a wall
             # this should be only updated each time placing a wall
             self.openWays = {"upDown": initialBoard(8, 9, True), "leftRight": initialBoard(9, 8, True)}
+            # the same ways as flat edges, and CLOSED_EDGE at the end (see NEIGHBOR_EDGES)
+            self.openEdges = [True] * NUM_EDGES + [False]
 
             # Possible next positions at the start : 9x9 
             self._validNextPositions = initialBoard(9, 9, False)
             self._validNextPositionsUpdated = False
 
+            # distance of every cell to the goal line of each pawn, not considering pawns: [of pawn 0, of pawn 1]
+            # this should be only updated each time placing a wall (see repairDistancesAfterClosing)
+            self.distancesToGoal = [getDistancesToGoalRow(pawn.goalRow, self.openEdges) for pawn in self.board.pawns]
+
+            # visited marks of existPathToGoalRow: a cell is visited by the current search if its mark is _searchEpoch
+            self._visitedEpochs = [0] * 81
+            self._searchEpoch = 0
+
+            # records of moves done, to undo them. (see pushMoveRecord, undoMove)
+            self.moveStack = []
+
+            # Zobrist hash of the position, updated on each move
+            self.hash = self.computeHash()
+
 
 
     def setTurn (self, newTurn):
         self.turn = newTurn
         self._validNextPositionsUpdated = False
         self._probableValidNextWallsUpdated = False
+        self._shortestPathWaysUpdated = False
+        self._noBlockWallsUpdated = False
 
 
     def getPawn0 (self):
@@ -134,18 +239,11 @@ class Game :
         return indicesOfValueIn2DArray(self.getValidNextPositions(), True)
     
     def isOpenWay(self, currentRow, currentCol, pawnMoveTuple) :
-        if (pawnMoveTuple[0] == -1 and  pawnMoveTuple[1] == 0)  :   # up
-            return (currentRow > 0 and  self.openWays["upDown"][currentRow - 1][currentCol])
-        elif (pawnMoveTuple[0] == 1 and  pawnMoveTuple[1] == 0) :  #down
-            return (currentRow < 8 and  self.openWays["upDown"][currentRow][currentCol])
-        elif (pawnMoveTuple[0] == 0 and  pawnMoveTuple[1] == -1) :  # left
-            return (currentCol > 0 and  self.openWays["leftRight"][currentRow][currentCol - 1])
-        elif (pawnMoveTuple[0] == 0 and  pawnMoveTuple[1] == 1) :  # right
-            return (currentCol < 8 and  self.openWays["leftRight"][currentRow][currentCol])
-        else :
-            raise("pawnMoveTuple should be one of [1, 0], [-1, 0], [0, 1], [0, -1]") 
-        
-    
+        move = MOVE_INDEX_OF_DELTA[pawnMoveTuple[0] * 3 + pawnMoveTuple[1] + 4]
+        if (move is None) :
+            raise Exception("pawnMoveTuple should be one of [1, 0], [-1, 0], [0, 1], [0, -1]")
+        return self.openEdges[NEIGHBOR_EDGES[currentRow * 9 + currentCol][move]]
+
 
     def getValidNextPositions(self) : 
         if (self._validNextPositionsUpdated == True) :
@@ -155,39 +253,36 @@ class Game :
 
         self._validNextPositions = initialBoard(9, 9, False)
         
-        self.set_validNextPositionsToward(MOVE_UP, MOVE_LEFT, MOVE_RIGHT)
-        self.set_validNextPositionsToward(MOVE_DOWN, MOVE_LEFT, MOVE_RIGHT)
-        self.set_validNextPositionsToward(MOVE_LEFT, MOVE_UP, MOVE_DOWN)
-        self.set_validNextPositionsToward(MOVE_RIGHT, MOVE_UP, MOVE_DOWN)
+        pawnPosition = self.getPawnAtTurn(returnTurn = True).position
+        otherPosition = self.getPawnAtTurn(returnTurn = False).position
+        cell = pawnPosition.row * 9 + pawnPosition.col
+        otherCell = otherPosition.row * 9 + otherPosition.col
+        for move in range(4) :
+            self.set_validNextPositionsToward(move, cell, otherCell)
         
         return self._validNextPositions
  
-    def set_validNextPositionsToward(self, mainMove, subMove1, subMove2):
-        if self.isValidNextMoveNotConsideringOtherPawn(self.getPawnAtTurn(returnTurn = True).position, mainMove) :
-            # mainMovePosition: the pawn's position after main move
-            mainMovePosition = self.getPawnAtTurn(returnTurn = True).position.newPosition(mainMove)
-            # if the other pawn is on the position after main move 
-            if mainMovePosition == self.getPawnAtTurn(returnTurn = False).position :
+    def set_validNextPositionsToward(self, mainMove, cell, otherCell):
+        # mainMove: index in MOVES, cell: cell of the pawn of this turn, otherCell: cell of the other pawn
+        openEdges = self.openEdges
+        if openEdges[NEIGHBOR_EDGES[cell][mainMove]] :
+            # mainMoveCell: the pawn's cell after main move
+            mainMoveCell = NEIGHBOR_CELLS[cell][mainMove]
+            # if the other pawn is on the cell after main move
+            if mainMoveCell == otherCell :
                 # check for jumping toward main move (e.g. up) direction
-                if self.isValidNextMoveNotConsideringOtherPawn(mainMovePosition, mainMove) :
-                    # mainMainMovePosition: the pawn's position after two main move
-                    mainMainMovePosition = mainMovePosition.newPosition(mainMove)
-                    self._validNextPositions[mainMainMovePosition.row][mainMainMovePosition.col] = True
+                if openEdges[NEIGHBOR_EDGES[otherCell][mainMove]] :
+                    jumpCell = NEIGHBOR_CELLS[otherCell][mainMove]
+                    self._validNextPositions[jumpCell // 9][jumpCell % 9] = True
                 else :
-                    # check for jumping toward sub move 1 (e.g. left) direction
-                    if (self.isValidNextMoveNotConsideringOtherPawn(mainMovePosition, subMove1)) :
-                        # mainSub1MovePosition: the pawn's position after (main move + sub move 1)
-                        mainSub1MovePosition = mainMovePosition.newPosition(subMove1)
-                        self._validNextPositions[mainSub1MovePosition.row][mainSub1MovePosition.col] = True
-                    
-                    # check for jumping toward sub move 2 (e.g. right) direction
-                    if self.isValidNextMoveNotConsideringOtherPawn(mainMovePosition, subMove2) :
-                        # mainSub2MovePosition: the pawn's position after (main move + sub move 2)
-                        mainSub2MovePosition = mainMovePosition.newPosition(subMove2)
-                        self._validNextPositions[mainSub2MovePosition.row][mainSub2MovePosition.col] = True
+                    # check for jumping toward sub moves (e.g. left and right) directions
+                    for subMove in SIDE_MOVES[mainMove] :
+                        if openEdges[NEIGHBOR_EDGES[otherCell][subMove]] :
+                            jumpCell = NEIGHBOR_CELLS[otherCell][subMove]
+                            self._validNextPositions[jumpCell // 9][jumpCell % 9] = True
                    
             else :
-                self._validNextPositions[mainMovePosition.row][mainMovePosition.col] = True
+                self._validNextPositions[mainMoveCell // 9][mainMoveCell % 9] = True
 
     def isPossibleNextMove(self, move) :
         movePawnTo = move[0]
@@ -206,19 +301,7 @@ class Game :
         this method checks if the moveTuple of the pawn of this turn is valid against walls on the board and the board size.
         this method do not check the validity against the other pawn's position. 
         """
-        if (moveTuple[0] == -1 and moveTuple[1] == 0) : # up
-            return (position.row > 0 and self.openWays["upDown"][position.row - 1][position.col])
-        
-        if (moveTuple[0] == 1 and moveTuple[1] == 0) : # down
-            return (position.row < 8 and self.openWays["upDown"][position.row][position.col])
-    
-        elif (moveTuple[0] == 0 and moveTuple[1] == -1) : # left
-            return (position.col > 0 and self.openWays["leftRight"][position.row][position.col - 1])
-    
-        elif (moveTuple[0] == 0 and moveTuple[1] == 1) : # right
-            return (position.col < 8 and self.openWays["leftRight"][position.row][position.col])
-        else :
-            raise Exception("moveTuple should be one of [1, 0], [-1, 0], [0, 1], [0, -1]")
+        return self.isOpenWay(position.row, position.col, moveTuple)
         
     def movePawn(self, row, col, needCheck = False) :
         if row >= len(self._validNextPositions) or col >= len(self._validNextPositions[0]):
@@ -228,6 +311,8 @@ class Game :
         if needCheck and not self._validNextPositions[row][col]  :
             return False
         
+        self.pushMoveRecord([[row, col], None, None], None)
+        self.hash = self.hashAfterMove([[row, col], None, None])
         self.getPawnAtTurn(returnTurn=True).position.row = row
         self.getPawnAtTurn(returnTurn=True).position.col = col
         if self.getPawnAtTurn(returnTurn=True).goalRow == self.getPawnAtTurn(returnTurn=True).position.row :
@@ -240,48 +325,109 @@ class Game :
 
     def testIfExistPathsToGoalLinesAfterPlaceHorizontalWall(self, row, col) :
         # wall which does not connected on two points do not block path.
-        
-        self.openWays["upDown"][row][col] = False
-        self.openWays["upDown"][row][col + 1] = False
-        result = self.existPathsToGoalLines()
-        self.openWays["upDown"][row][col] = True
-        self.openWays["upDown"][row][col + 1] = True
-        return result
+        # the verdicts of all the walls are used if they are already found for this position (see noBlockWalls)
+        if (self._noBlockWallsUpdated) :
+            return self._noBlockWalls["horizontal"][row][col]
+        return self.testIfExistPathsToGoalLinesAfterCloseEdges(*HORIZONTAL_WALL_EDGES[row * 8 + col])
 
     def testIfExistPathsToGoalLinesAfterPlaceVerticalWall(self, row, col) :
         # wall which does not connected on two points do not block path.
+        if (self._noBlockWallsUpdated) :
+            return self._noBlockWalls["vertical"][row][col]
+        return self.testIfExistPathsToGoalLinesAfterCloseEdges(*VERTICAL_WALL_EDGES[row * 8 + col])
+
+    def testIfExistPathsToGoalLinesAfterCloseEdges(self, edge1, edge2) :
+        # A wall which closes no way on the current shortest path of a pawn can not block the pawn,
+        # so only a pawn whose shortest path is cut by the wall needs to be searched again.
+        shortestPathWays = self.shortestPathWays()
+        pawnsToSearch = []
+        for pawn in self.board.pawns :
+            pathWays = shortestPathWays[pawn.index]
+            if (pathWays is None or edge1 in pathWays or edge2 in pathWays) :
+                pawnsToSearch.append(pawn)
+        if (len(pawnsToSearch) == 0) :
+            return True
         
-        self.openWays["leftRight"][row][col] = False
-        self.openWays["leftRight"][row+1][col] = False
-        result = self.existPathsToGoalLines()
-        self.openWays["leftRight"][row][col] = True
-        self.openWays["leftRight"][row+1][col] = True
+        openEdges = self.openEdges
+        open1 = openEdges[edge1]
+        open2 = openEdges[edge2]
+        openEdges[edge1] = False
+        openEdges[edge2] = False
+        result = True
+        for pawn in pawnsToSearch :
+            if (not self.existPathsToGoalLineFor(pawn)) :
+                result = False
+                break
+        openEdges[edge1] = open1
+        openEdges[edge2] = open2
         return result
+
+    def shortestPathWays(self) :
+        # ways on a shortest path to the goal line of each pawn: [ways of pawn 0, ways of pawn 1]
+        # each way is an edge (see NEIGHBOR_EDGES).
+        if (self._shortestPathWaysUpdated) :
+            return self._shortestPathWays
+        
+        self._shortestPathWaysUpdated = True
+        self._shortestPathWays = [getShortestPathWaysOf(self.getPawn0(), self), getShortestPathWaysOf(self.getPawn1(), self)]
+        return self._shortestPathWays
+
+    def pathCuttingWallsMasks(self) :
+        # walls closing a way on the shortest path of a pawn (see shortestPathWays): (horizontal mask, vertical mask)
+        # The other walls can not block a path.
+        horizontal = 0
+        vertical = 0
+        for pathWays in self.shortestPathWays() :
+            if (pathWays is None) :
+                return ALL_WALLS, ALL_WALLS
+            for edge in pathWays :
+                closingHorizontal, closingVertical = EDGE_CLOSING_WALLS_MASKS[edge]
+                horizontal |= closingHorizontal
+                vertical |= closingVertical
+        return horizontal, vertical
+
+    def noBlockWalls(self) :
+        # whether each wall would leave a path to the goal line for both pawns, for all the walls at once:
+        # {"horizontal": 8 by 8 2D bool array, "vertical": 8 by 8 2D bool array} (see getNoBlockWalls)
+        # The verdicts of walls which are not valid (see validNextWalls) mean nothing.
+        if (self._noBlockWallsUpdated) :
+            return self._noBlockWalls
+        
+        self._noBlockWallsUpdated = True
+        self._noBlockWalls = getNoBlockWalls(self)
+        return self._noBlockWalls
     
     def existPathsToGoalLines (self):
         return self.existPathsToGoalLineFor(self.getPawnAtTurn(returnTurn=True)) and  self.existPathsToGoalLineFor(self.getPawnAtTurn(returnTurn=False))
      
-    def depthFirstSearch(self, visited, currentRow, currentCol, goalRow):
-        if currentRow == goalRow :
+    def existPathToGoalRow(self, startCell, goalRow) :
+        # depth first search with an explicit stack, moving toward the goal row first.
+        # Cells are marked visited with the number of the search (epoch), so the marks never need clearing.
+        if startCell // 9 == goalRow :
             return True
-        for pawnMove in MOVES :
-            if self.isValidNextMoveNotConsideringOtherPawn(PawnPosition(currentRow, currentCol), pawnMove) :
-                    nextRow = currentRow + pawnMove[0]
-                    nextCol = currentCol + pawnMove[1]
-                    if not visited[nextRow][nextCol]  :
-                        visited[nextRow][nextCol] = True
-                    
-                        if self.depthFirstSearch(visited, nextRow, nextCol, goalRow) :
-                            return True         
-                        
+        self._searchEpoch += 1
+        epoch = self._searchEpoch
+        visited = self._visitedEpochs
+        visited[startCell] = epoch
+        openEdges = self.openEdges
+        moveOrder = MOVE_ORDER_TOWARD_ROW[goalRow]
+        stack = [startCell]
+        while stack :
+            cell = stack.pop()
+            neighborEdges = NEIGHBOR_EDGES[cell]
+            neighborCells = NEIGHBOR_CELLS[cell]
+            for move in moveOrder :
+                if openEdges[neighborEdges[move]] :
+                    nextCell = neighborCells[move]
+                    if visited[nextCell] != epoch :
+                        if nextCell // 9 == goalRow :
+                            return True
+                        visited[nextCell] = epoch
+                        stack.append(nextCell)
+        return False
 
     def existPathsToGoalLineFor(self, pawn):
-        visited = initialBoard(9, 9, False)
-        res = self.depthFirstSearch(visited, pawn.position.row, pawn.position.col, pawn.goalRow)
-        if res : 
-            return True
-        else:
-            return False
+        return self.existPathToGoalRow(pawn.position.row * 9 + pawn.position.col, pawn.goalRow)
     
     # To be checked
     def placeHorizontalWall(self, row, col, needCheck = False) :
@@ -289,19 +435,28 @@ class Game :
             print("You need to leave at least one path to the goal for each pawn.")
             return False
         
-        self.openWays["upDown"][row][col] = False
-        self.openWays["upDown"][row][col + 1] = False
-        self.validNextWalls["vertical"][row][col] = False
-        self.validNextWalls["horizontal"][row][col] = False
+        changes = []
+        self.pushMoveRecord([None, [row, col], None], changes)
+        self.hash = self.hashAfterMove([None, [row, col], None])
+        setAndRecord(changes, self.openWays["upDown"], row, col, False)
+        setAndRecord(changes, self.openWays["upDown"], row, col + 1, False)
+        for edge in HORIZONTAL_WALL_EDGES[row * 8 + col] :
+            setAndRecord(changes, self.openEdges, edge, None, False)
+        self.repairDistancesToGoal(changes, HORIZONTAL_WALL_EDGES[row * 8 + col])
+        setAndRecord(changes, self.validNextWalls["vertical"], row, col, False)
+        setAndRecord(changes, self.validNextWalls["horizontal"], row, col, False)
         if (col > 0) :
-            self.validNextWalls["horizontal"][row][col - 1] = False
+            setAndRecord(changes, self.validNextWalls["horizontal"], row, col - 1, False)
         
         if (col < 7) :
-            self.validNextWalls["horizontal"][row][col + 1] = False
+            setAndRecord(changes, self.validNextWalls["horizontal"], row, col + 1, False)
         
-        self.board.walls["horizontal"][row][col] = True
+        setAndRecord(changes, self.board.walls["horizontal"], row, col, True)
+        invalidHorizontals, invalidVerticals = HORIZONTAL_WALL_INVALIDATES[row * 8 + col]
+        setAndRecord(changes, self.validNextWallsMasks, 0, None, self.validNextWallsMasks[0] & ~invalidHorizontals)
+        setAndRecord(changes, self.validNextWallsMasks, 1, None, self.validNextWallsMasks[1] & ~invalidVerticals)
+        self.numOfPlacedWalls += 1
         
-        #self.adjustProbableValidNextWallForAfterPlaceHorizontalWall(row, col)
         self.getPawnAtTurn(returnTurn=True).numberOfLeftWalls -= 1
         self.setTurn(self.turn +1)
         return True
@@ -312,24 +467,38 @@ class Game :
             print("You need to leave at least one path to the goal for each pawn.")
             return False
         
-        self.openWays["leftRight"][row][col] = False
-        self.openWays["leftRight"][row+1][col] = False
-        self.validNextWalls["horizontal"][row][col] = False
-        self.validNextWalls["vertical"][row][col] = False
+        changes = []
+        self.pushMoveRecord([None, None, [row, col]], changes)
+        self.hash = self.hashAfterMove([None, None, [row, col]])
+        setAndRecord(changes, self.openWays["leftRight"], row, col, False)
+        setAndRecord(changes, self.openWays["leftRight"], row+1, col, False)
+        for edge in VERTICAL_WALL_EDGES[row * 8 + col] :
+            setAndRecord(changes, self.openEdges, edge, None, False)
+        self.repairDistancesToGoal(changes, VERTICAL_WALL_EDGES[row * 8 + col])
+        setAndRecord(changes, self.validNextWalls["horizontal"], row, col, False)
+        setAndRecord(changes, self.validNextWalls["vertical"], row, col, False)
         if (row > 0) :
-            self.validNextWalls["vertical"][row-1][col] = False
+            setAndRecord(changes, self.validNextWalls["vertical"], row-1, col, False)
         
         if (row < 7) :
-            self.validNextWalls["vertical"][row+1][col] = False
+            setAndRecord(changes, self.validNextWalls["vertical"], row+1, col, False)
         
-        self.board.walls["vertical"][row][col] = True
+        setAndRecord(changes, self.board.walls["vertical"], row, col, True)
+        invalidHorizontals, invalidVerticals = VERTICAL_WALL_INVALIDATES[row * 8 + col]
+        setAndRecord(changes, self.validNextWallsMasks, 0, None, self.validNextWallsMasks[0] & ~invalidHorizontals)
+        setAndRecord(changes, self.validNextWallsMasks, 1, None, self.validNextWallsMasks[1] & ~invalidVerticals)
+        self.numOfPlacedWalls += 1
         
-        #self.adjustProbableValidNextWallForAfterPlaceVerticalWall(row, col)
         self.getPawnAtTurn(returnTurn=True).numberOfLeftWalls -= 1
         self.setTurn(self.turn +1)
         return True
     
 
+    def repairDistancesToGoal(self, changes, closedEdges) :
+        for distances in self.distancesToGoal :
+            for cell, distance in repairDistancesAfterClosing(distances, self.openEdges, closedEdges).items() :
+                setAndRecord(changes, distances, cell, None, distance)
+
     def doMove(self, move, needCheck = False) :
         if not move :
             return False
@@ -347,158 +516,150 @@ class Game :
             return  self.placeVerticalWall(placeVerticalWallAt[0], placeVerticalWallAt[1], needCheck)
         
 
-    def getArrOfValidNoBlockNextHorizontalWallPositions(self,):
-        nextHorizontals = indicesOfValueIn2DArray(self.validNextWalls["horizontal"], True)
-        noBlockNextHorizontals = []
-        for i in range(len(nextHorizontals)) :
-            if (self.testIfExistPathsToGoalLinesAfterPlaceHorizontalWall(nextHorizontals[i][0], nextHorizontals[i][1])):   
-                noBlockNextHorizontals.append(nextHorizontals[i])
+    def pushMoveRecord(self, move, wallChanges) :
+        # must be called before the move changes anything.
+        # wallChanges is None for a pawn move,
+        # otherwise it is filled with changes of 2D arrays by placing the wall (see setAndRecord).
+        pawn = self.getPawnAtTurn(returnTurn=True)
+        self.moveStack.append((
+            move, pawn.position.row, pawn.position.col, wallChanges, self.winner,
+            self._validNextPositions, self._validNextPositionsUpdated,
+            self._probableValidNextWallsMasks, self._probableValidNextWalls, self._probableValidNextWallsUpdated,
+            self.hash
+        ))
 
-        return noBlockNextHorizontals
+    def computeHash(self) :
+        h = 0
+        for pawn in self.board.pawns :
+            h ^= ZOBRIST_PAWN[pawn.index][pawn.position.row * 9 + pawn.position.col]
+            h ^= ZOBRIST_LEFT_WALLS[pawn.index][pawn.numberOfLeftWalls]
+        for row in range(8) :
+            for col in range(8) :
+                if (self.board.walls["horizontal"][row][col]) :
+                    h ^= ZOBRIST_HORIZONTAL_WALL[row * 8 + col]
+                if (self.board.walls["vertical"][row][col]) :
+                    h ^= ZOBRIST_VERTICAL_WALL[row * 8 + col]
+        if (self.turn % 2 == 1) :
+            h ^= ZOBRIST_TURN
+        return h
 
-    def getArrOfValidNoBlockNextVerticalWallPositions(self,):
-        nextVerticals = indicesOfValueIn2DArray(self.validNextWalls["vertical"], True)
-        noBlockNextVerticals = []
-        for i in range(len(nextVerticals)) :
-            if (self.testIfExistPathsToGoalLinesAfterPlaceVerticalWall(nextVerticals[i][0], nextVerticals[i][1])):
-                noBlockNextVerticals.append(nextVerticals[i])
+    def hashAfterMove(self, move) :
+        # hash of the position after the move by the pawn of this turn, without doing the move
+        return zobristHashAfterMove(self.hash, self.getPawnAtTurn(returnTurn=True), move)
+
+    def getMoveHistory(self) :
+        return [record[0] for record in self.moveStack]
+
+    def undoMove(self) :
+        """
+        this method restores the state exactly as before the last move,
+        so a search can walk one game down and back up the tree instead of copying it.
+        """
+        if (len(self.moveStack) == 0) :
+            return False
+        
+        (move, row, col, wallChanges, winner,
+         validNextPositions, validNextPositionsUpdated,
+         probableValidNextWallsMasks, probableValidNextWalls, probableValidNextWallsUpdated,
+         self.hash) = self.moveStack.pop()
+        self.turn -= 1
+        pawn = self.getPawnAtTurn(returnTurn=True)
+        if (wallChanges is None) :
+            pawn.position.row = row
+            pawn.position.col = col
+        else :
+            for i in range(len(wallChanges) - 1, -1, -1) :
+                arr, changedRow, changedCol, value = wallChanges[i]
+                if (changedCol is None) :
+                    arr[changedRow] = value
+                else :
+                    arr[changedRow][changedCol] = value
+            pawn.numberOfLeftWalls += 1
+            self.numOfPlacedWalls -= 1
+        
+        self.winner = winner
+        self._shortestPathWaysUpdated = False
+        self._noBlockWallsUpdated = False
+        self._validNextPositions = validNextPositions
+        self._validNextPositionsUpdated = validNextPositionsUpdated
+        self._probableValidNextWallsMasks = probableValidNextWallsMasks
+        self._probableValidNextWalls = probableValidNextWalls
+        self._probableValidNextWallsUpdated = probableValidNextWallsUpdated
+        return True
+
+    def getArrOfValidNoBlockNextHorizontalWallPositions(self,):
+        noBlockWalls = self.noBlockWalls()["horizontal"]
+        return [[row, col] for row, col in indicesOfValueIn2DArray(self.validNextWalls["horizontal"], True) if noBlockWalls[row][col]]
 
-        return noBlockNextVerticals
+    def getArrOfValidNoBlockNextVerticalWallPositions(self,):
+        noBlockWalls = self.noBlockWalls()["vertical"]
+        return [[row, col] for row, col in indicesOfValueIn2DArray(self.validNextWalls["vertical"], True) if noBlockWalls[row][col]]
     
 
     # heuristic:
-    # In expansion phase,
+    # In playouts,
     # do not consider all possible wall positions,
     # only consider probable next walls.
     # This heuristic decreases the branching factor.
     #
     # Probable next walls are
     # 1. near pawns (to disturb opponent or support myself)
-    # 2. near already placed walls
-    # 3. leftest side, rightest side horizontal walls
-    def probableValidNextWalls(self) :
+    # 2. leftest side, rightest side horizontal walls
+    #
+    # They are found with a few operations on masks: (horizontal mask, vertical mask)
+    def probableValidNextWallsMasks(self) :
         if (self._probableValidNextWallsUpdated) :
-            return self._probableValidNextWalls
-        
-        self._probableValidNextWallsUpdated = True
-        
-        # near already placed walls
-        _probableValidNextWalls = {
-            "horizontal": copy.deepcopy(self._probableNextWalls["horizontal"]),
-            "vertical": copy.deepcopy(self._probableNextWalls["vertical"])
-        }
+            return self._probableValidNextWallsMasks
+
+        horizontal = 0
+        vertical = 0
 
         # leftmost and rightmost horizontal walls
         # after several turns
         if (self.turn >= 6) :
-            for i in range(8) :
-                _probableValidNextWalls["horizontal"][i][0] = True
-                _probableValidNextWalls["horizontal"][i][7] = True
+            horizontal |= SIDE_HORIZONTAL_WALLS
 
         # near pawns
         # place walls to diturb opponent or support myself
         # only after several turns
         if (self.turn >= 3) :
             # disturb opponent
-            setWallsBesidePawn(_probableValidNextWalls, self.getPawnAtTurn(returnTurn=False))
-        
-        if (self.turn >= 6
-            or len(indicesOfValueIn2DArray(self.board.walls["horizontal"], True)) > 0
-            or len(indicesOfValueIn2DArray(self.board.walls["vertical"], True)) > 0) :
-            # support myself    
-            setWallsBesidePawn(_probableValidNextWalls, self.getPawnAtTurn(returnTurn=True))
-        
-        _probableValidNextWalls["horizontal"] = logicalAndBetween2DArray(_probableValidNextWalls["horizontal"], self.validNextWalls["horizontal"])
-        _probableValidNextWalls["vertical"] = logicalAndBetween2DArray(_probableValidNextWalls["vertical"], self.validNextWalls["vertical"])
-        self._probableValidNextWalls = _probableValidNextWalls
-        return _probableValidNextWalls
-    
-def getArrOfValidNoBlockNextWallsDisturbPathOf(pawn, game) :
-    validNextWallsInterupt = getValidNextWallsDisturbPathOf(pawn, game)
-    nextHorizontals = indicesOfValueIn2DArray(validNextWallsInterupt["horizontal"], True)
-    noBlockNextHorizontals = []
-    for i in range(len(nextHorizontals)) :
-        if (game.testIfExistPathsToGoalLinesAfterPlaceHorizontalWall(nextHorizontals[i][0], nextHorizontals[i][1])) :   
-            noBlockNextHorizontals.append(nextHorizontals[i])
-        
-    
-    nextVerticals = indicesOfValueIn2DArray(validNextWallsInterupt["vertical"], True)
-    noBlockNextVerticals = []
-    for i in range(len(nextVerticals)) :
-        if (game.testIfExistPathsToGoalLinesAfterPlaceVerticalWall(nextVerticals[i][0], nextVerticals[i][1])) :
-            noBlockNextVerticals.append(nextVerticals[i])
-        
-    
-    return {"horizontal": noBlockNextHorizontals, "vertical": noBlockNextVerticals}
+            position = self.getPawnAtTurn(returnTurn=False).position
+            besideHorizontal, besideVertical = WALLS_BESIDE_CELL[position.row * 9 + position.col]
+            horizontal |= besideHorizontal
+            vertical |= besideVertical
+
+        if (self.turn >= 6 or self.numOfPlacedWalls > 0) :
+            # support myself
+            position = self.getPawnAtTurn(returnTurn=True).position
+            besideHorizontal, besideVertical = WALLS_BESIDE_CELL[position.row * 9 + position.col]
+            horizontal |= besideHorizontal
+            vertical |= besideVertical
 
+        self._probableValidNextWallsUpdated = True
+        self._probableValidNextWallsMasks = (horizontal & self.validNextWallsMasks[0], vertical & self.validNextWallsMasks[1])
+        self._probableValidNextWalls = None
+        return self._probableValidNextWallsMasks
 
+    def probableValidNextWalls(self) :
+        # the probable next walls as 2D bool arrays: {"horizontal": 8 by 8, "vertical": 8 by 8}
+        horizontal, vertical = self.probableValidNextWallsMasks()
+        if (self._probableValidNextWalls is None) :
+            self._probableValidNextWalls = {"horizontal": mask2DArray(horizontal, 8, 8), "vertical": mask2DArray(vertical, 8, 8)}
+        return self._probableValidNextWalls
+    
 def getValidNextWallsDisturbPathOf(pawn, game):
     validInterruptHorizontalWalls = initialBoard(8, 8, False)
     validInterruptVerticalWalls = initialBoard(8, 8, False)
+    wall2DArrays = {"horizontal": validInterruptHorizontalWalls, "vertical": validInterruptVerticalWalls}
     
-    # add (1) walls interrupt shortest paths of the pawn
-    visited = initialBoard(9, 9, False)
-    t = getAllShortestPathsToEveryPosition(pawn, game)
-    dist = t[0]
-    prev = t[1]
-    goalRow = pawn.goalRow
-    goalCols = [ ind for ind, v in enumerate(dist[goalRow]) if v == min(dist[goalRow])]
-    
-    queue = deque([])
-    for i in range(len(goalCols)) :
-        goalPosition = PawnPosition(goalRow, goalCols[i])
-        queue.append(goalPosition)
-    
-    
-    while (len(queue) > 0) :
-        position = queue.popleft()
-        prevs = prev[position.row][position.col]
-        if (prevs is None) :
-            # for debug
-            if (not len(queue) == 0) :
-                raise Exception("some error occured....")
-            continue # this can be "break"
-            # because if condition holds true only if current position is start position.
-        
-        for i in range(len(prevs)) :
-            prevPosition = prevs[i]
-            pawnMoveTuple = [position.row - prevPosition.row, position.col - prevPosition.col]  
-            # mark valid walls which can interupt the pawn move
-            if (pawnMoveTuple[0] == -1 and pawnMoveTuple[1] == 0) : # up
-                if (prevPosition.col < 8) :
-                    validInterruptHorizontalWalls[prevPosition.row-1][prevPosition.col] = True
-                
-                if (prevPosition.col > 0) :
-                    validInterruptHorizontalWalls[prevPosition.row-1][prevPosition.col-1] = True
-                    
-            elif (pawnMoveTuple[0] == 1 and pawnMoveTuple[1] == 0) : # down
-                if (prevPosition.col < 8) :
-                    validInterruptHorizontalWalls[prevPosition.row][prevPosition.col] = True                   
-                if (prevPosition.col > 0) :
-                    validInterruptHorizontalWalls[prevPosition.row][prevPosition.col-1] = True
-                    
-            elif (pawnMoveTuple[0] == 0 and pawnMoveTuple[1] == -1) : # left
-                if (prevPosition.row < 8) :
-                    validInterruptVerticalWalls[prevPosition.row][prevPosition.col-1] = True
-                
-                if (prevPosition.row > 0) :
-                    validInterruptVerticalWalls[prevPosition.row-1][prevPosition.col-1] = True
-                    
-            elif (pawnMoveTuple[0] == 0 and pawnMoveTuple[1] == 1) : # right
-                if (prevPosition.row < 8) :
-                    validInterruptVerticalWalls[prevPosition.row][prevPosition.col] = True
-                
-                if (prevPosition.row > 0) :
-                    validInterruptVerticalWalls[prevPosition.row-1][prevPosition.col] = True
-                
-            
-                            
-            if (not visited[prevPosition.row][prevPosition.col]) :
-                visited[prevPosition.row][prevPosition.col] = True
-                queue.append(prevPosition)
+    # add (1) walls interrupt shortest paths of the pawn:
+    # the walls closing any way on a shortest path to the nearest cells of the goal line
+    for edge in getShortestPathsWaysOf(pawn, game) :
+        for direction, row, col in WALLS_CLOSING_EDGE[edge] :
+            wall2DArrays[direction][row][col] = True
     
     # add (2) walls beside the pawn
-    wall2DArrays = {"horizontal": validInterruptHorizontalWalls, "vertical": validInterruptVerticalWalls}
     setWallsBesidePawn(wall2DArrays, pawn)
 
     # extract only valid walls
@@ -507,41 +668,310 @@ def getValidNextWallsDisturbPathOf(pawn, game):
     
     return wall2DArrays
 
-def getAllShortestPathsToEveryPosition(pawn, game) :
-        searched = initialBoard(9, 9, False)
-        visited = initialBoard(9, 9, False)
-        dist = initialBoard(9, 9, np.inf)
-        multiPrev = initialBoard(9, 9, None)
-
-        pawnMoveTuples = [MOVE_UP, MOVE_RIGHT, MOVE_DOWN, MOVE_LEFT]
-        queue = deque([])
-        visited[pawn.position.row][pawn.position.col] = True
-        dist[pawn.position.row][pawn.position.col] = 0
-        queue.append(pawn.position)
-        while (len(queue) > 0) :
-            position = queue.popleft()
-            for i in range(len(pawnMoveTuples)) :
-                if (game.isOpenWay(position.row, position.col, pawnMoveTuples[i])) :
-                    nextPosition = position.newPosition(pawnMoveTuples[i])
-                    if ( not searched[nextPosition.row][nextPosition.col]) :
-                        alt = dist[position.row][position.col] + 1
-                        # when this inequality holds, dist[nextPosition.row][nextPosition.col] === infinity
-                        # because alt won't be decreased in this BFS.
-                        if (alt < dist[nextPosition.row][nextPosition.col]) :
-                            dist[nextPosition.row][nextPosition.col] = alt
-                            multiPrev[nextPosition.row][nextPosition.col] = [position]
-                        elif alt == dist[nextPosition.row][nextPosition.col] :
-                            multiPrev[nextPosition.row][nextPosition.col].append(position)
-                        
-                        if (not visited[nextPosition.row][nextPosition.col]) :
-                            visited[nextPosition.row][nextPosition.col] = True
-                            queue.append(nextPosition)
-           
-            searched[position.row][position.col] = True
+
+UNREACHABLE = 1000   # distance of a cell from which the goal line can not be reached
+
+
+def getDistancesToGoalRow(goalRow, openEdges) :
+    # distance of every cell to the goal row, not considering pawns, UNREACHABLE if there is no path.
+    # Breadth first search from all cells of the goal row at once.
+    distances = [UNREACHABLE] * 81
+    queue = list(range(goalRow * 9, goalRow * 9 + 9))
+    for cell in queue :
+        distances[cell] = 0
+    for cell in queue :
+        alt = distances[cell] + 1
+        neighborEdges = NEIGHBOR_EDGES[cell]
+        for move in range(4) :
+            if (openEdges[neighborEdges[move]]) :
+                nextCell = NEIGHBOR_CELLS[cell][move]
+                if (distances[nextCell] == UNREACHABLE) :
+                    distances[nextCell] = alt
+                    queue.append(nextCell)
+    return distances
+
+
+def repairDistancesAfterClosing(distances, openEdges, closedEdges) :
+    # distances: distances to a goal row (see getDistancesToGoalRow) before closing the edges,
+    # openEdges: open edges after closing them.
+    # Returns {cell: new distance} of the cells whose distances change, without changing distances.
+    #
+    # Closing edges only increases distances, and only of the cells which lose every neighbor one step nearer
+    # to the goal row (a "support") through an open edge. Such cells are found level by level from the closed edges,
+    # since a cell can only lose its support when a neighbor one level nearer loses its own.
+    # Then only those cells are searched again, from the distances of their unchanged neighbors.
+    def hasSupport(cell) :
+        target = distances[cell] - 1
+        neighborCells = NEIGHBOR_CELLS[cell]
+        neighborEdges = NEIGHBOR_EDGES[cell]
+        for move in range(4) :
+            if (openEdges[neighborEdges[move]] and distances[neighborCells[move]] == target
+                and not neighborCells[move] in affected) :
+                return True
+        return False
+    
+    affected = set()
+    checked = set()
+    heap = []
+    for edge in closedEdges :
+        cell1, cell2 = EDGE_CELLS[edge]
+        if (distances[cell1] == distances[cell2] + 1) :
+            heapq.heappush(heap, (distances[cell1], cell1))
+        elif (distances[cell2] == distances[cell1] + 1) :
+            heapq.heappush(heap, (distances[cell2], cell2))
+    while (len(heap) > 0) :
+        distance, cell = heapq.heappop(heap)
+        if (cell in checked) :
+            continue
+        checked.add(cell)
+        if (hasSupport(cell)) :
+            continue
+        affected.add(cell)
+        neighborCells = NEIGHBOR_CELLS[cell]
+        neighborEdges = NEIGHBOR_EDGES[cell]
+        for move in range(4) :
+            nextCell = neighborCells[move]
+            if (openEdges[neighborEdges[move]] and distances[nextCell] == distance + 1) :
+                heapq.heappush(heap, (distance + 1, nextCell))
+    
+    if (len(affected) == 0) :
+        return {}
+    
+    newDistances = {}
+    for cell in affected :
+        best = UNREACHABLE
+        neighborCells = NEIGHBOR_CELLS[cell]
+        neighborEdges = NEIGHBOR_EDGES[cell]
+        for move in range(4) :
+            nextCell = neighborCells[move]
+            if (openEdges[neighborEdges[move]] and not nextCell in affected and distances[nextCell] + 1 < best) :
+                best = distances[nextCell] + 1
+        newDistances[cell] = best
+        if (best < UNREACHABLE) :
+            heapq.heappush(heap, (best, cell))
+    while (len(heap) > 0) :
+        distance, cell = heapq.heappop(heap)
+        if (distance > newDistances[cell]) :
+            continue
+        neighborCells = NEIGHBOR_CELLS[cell]
+        neighborEdges = NEIGHBOR_EDGES[cell]
+        for move in range(4) :
+            nextCell = neighborCells[move]
+            if (openEdges[neighborEdges[move]] and nextCell in affected and distance + 1 < newDistances[nextCell]) :
+                newDistances[nextCell] = distance + 1
+                heapq.heappush(heap, (distance + 1, nextCell))
+    return newDistances
+
+
+def zobristHashAfterMove(h, pawn, move) :
+    h ^= ZOBRIST_TURN
+    if (move[0]) :
+        h ^= ZOBRIST_PAWN[pawn.index][pawn.position.row * 9 + pawn.position.col]
+        h ^= ZOBRIST_PAWN[pawn.index][move[0][0] * 9 + move[0][1]]
+    else :
+        if (move[1]) :
+            h ^= ZOBRIST_HORIZONTAL_WALL[move[1][0] * 8 + move[1][1]]
+        else :
+            h ^= ZOBRIST_VERTICAL_WALL[move[2][0] * 8 + move[2][1]]
+        h ^= ZOBRIST_LEFT_WALLS[pawn.index][pawn.numberOfLeftWalls]
+        h ^= ZOBRIST_LEFT_WALLS[pawn.index][pawn.numberOfLeftWalls - 1]
+    return h
+
+
+def setAndRecord(changes, arr, row, col, value) :
+    # arr is a 2D array, or a flat array when col is None
+    if (col is None) :
+        changes.append((arr, row, None, arr[row]))
+        arr[row] = value
+        return
+    changes.append((arr, row, col, arr[row][col]))
+    arr[row][col] = value
+
+
+def findRoot(parent, node) :
+    # union-find root, halving the path on the way
+    while (parent[node] != node) :
+        parent[node] = parent[parent[node]]
+        node = parent[node]
+    return node
+
+
+def getNoBlockWalls(game) :
+    # Verdicts of all the walls from one connectivity index of the position.
+    # A wall closing no way on the shortest path of a pawn (see Game.shortestPathWays) can not block it.
+    # The index is a union-find over the cells joined by the open ways,
+    # except the ways on those paths and the other ways of the walls cutting them.
+    # If a pawn is joined to a cell of its goal line in the index, no wall blocks it.
+    # Otherwise only the few removed ways join the components of the index, and the verdict of each wall
+    # cutting the path is a union-find over the components and the goal node (see GOAL_NODES) with them, but the wall's ways.
+    noBlockWalls = {"horizontal": initialBoard(8, 8, True), "vertical": initialBoard(8, 8, True)}
+    wallEdges = {"horizontal": HORIZONTAL_WALL_EDGES, "vertical": VERTICAL_WALL_EDGES}
+    openEdges = game.openEdges
+    shortestPathWays = game.shortestPathWays()
+    
+    cuttingWalls = [set(), set()]
+    removedEdges = set()
+    for pawn in game.board.pawns :
+        pathWays = shortestPathWays[pawn.index]
+        if (pathWays is None) :
+            # already blocked
+            return {"horizontal": initialBoard(8, 8, False), "vertical": initialBoard(8, 8, False)}
+        removedEdges.update(pathWays)
+        for edge in pathWays :
+            cuttingWalls[pawn.index].update(WALLS_CLOSING_EDGE[edge])
+    for direction, row, col in cuttingWalls[0] | cuttingWalls[1] :
+        removedEdges.update(wallEdges[direction][row * 8 + col])
+    
+    parent = list(range(81))
+    for edge in range(NUM_EDGES) :
+        if (openEdges[edge] and not edge in removedEdges) :
+            # findRoot inlined, this is the hot loop
+            root1, root2 = EDGE_CELLS[edge]
+            while (parent[root1] != root1) :
+                parent[root1] = parent[parent[root1]]
+                root1 = parent[root1]
+            while (parent[root2] != root2) :
+                parent[root2] = parent[parent[root2]]
+                root2 = parent[root2]
+            if (root1 != root2) :
+                parent[root1] = root2
+    
+    componentEdges = None
+    for pawn in game.board.pawns :
+        startRoot = findRoot(parent, pawn.position.row * 9 + pawn.position.col)
+        goalRoots = set(findRoot(parent, cell) for cell in range(pawn.goalRow * 9, pawn.goalRow * 9 + 9))
+        if (startRoot in goalRoots) :
+            continue
+        
+        if (componentEdges is None) :
+            # the removed ways which are open, between different components
+            componentEdges = []
+            for edge in removedEdges :
+                if (openEdges[edge]) :
+                    cell1, cell2 = EDGE_CELLS[edge]
+                    root1 = findRoot(parent, cell1)
+                    root2 = findRoot(parent, cell2)
+                    if (root1 != root2) :
+                        componentEdges.append((edge, root1, root2))
         
-        return [dist, multiPrev]
+        # the components as nodes: the goal node (see GOAL_NODES) stands for the components of the goal line
+        goalNode = GOAL_NODES[pawn.goalRow]
+        nodeOf = dict.fromkeys(goalRoots, goalNode)
+        nodeEdges = [(edge, nodeOf.get(root1, root1), nodeOf.get(root2, root2)) for edge, root1, root2 in componentEdges]
+        
+        # A wall closing no way on one path from the pawn to the goal node over the components can not block it either.
+        # (the path is found by breadth first search over the components)
+        adjacentEdges = {}
+        for nodeEdge in nodeEdges :
+            adjacentEdges.setdefault(nodeEdge[1], []).append(nodeEdge)
+            adjacentEdges.setdefault(nodeEdge[2], []).append(nodeEdge)
+        prevEdge = {startRoot: None}
+        queue = [startRoot]
+        for node in queue :
+            if (node == goalNode) :
+                break
+            for edge, node1, node2 in adjacentEdges.get(node, ()) :
+                nextNode = node2 if node1 == node else node1
+                if (not nextNode in prevEdge) :
+                    prevEdge[nextNode] = (edge, node)
+                    queue.append(nextNode)
+        pathEdges = set()
+        node = goalNode
+        while (not prevEdge[node] is None) :
+            edge, node = prevEdge[node]
+            pathEdges.add(edge)
+        
+        for direction, row, col in cuttingWalls[pawn.index] :
+            closedEdges = wallEdges[direction][row * 8 + col]
+            if (not closedEdges[0] in pathEdges and not closedEdges[1] in pathEdges) :
+                continue
+            nodeParent = {}
+            for edge, node1, node2 in nodeEdges :
+                if (edge in closedEdges) :
+                    continue
+                root1 = findRoot(nodeParent, nodeParent.setdefault(node1, node1))
+                root2 = findRoot(nodeParent, nodeParent.setdefault(node2, node2))
+                if (root1 != root2) :
+                    nodeParent[root1] = root2
+            if (not startRoot in nodeParent or findRoot(nodeParent, startRoot) != findRoot(nodeParent, nodeParent.setdefault(goalNode, goalNode))) :
+                noBlockWalls[direction][row][col] = False
+    
+    return noBlockWalls
 
 
+def getShortestPathWaysOf(pawn, game) :
+    # ways on one shortest path of the pawn to its goal line, as a set of edges (see NEIGHBOR_EDGES),
+    # None if there is no path.
+    # The path goes down the distances to the goal line kept by the game (see distancesToGoal), without searching.
+    openEdges = game.openEdges
+    distances = game.distancesToGoal[pawn.index]
+    cell = pawn.position.row * 9 + pawn.position.col
+    distance = distances[cell]
+    if (distance >= UNREACHABLE) :
+        return None
+    
+    ways = set()
+    while (distance > 0) :
+        neighborEdges = NEIGHBOR_EDGES[cell]
+        neighborCells = NEIGHBOR_CELLS[cell]
+        distance -= 1
+        for move in range(4) :
+            if (openEdges[neighborEdges[move]] and distances[neighborCells[move]] == distance) :
+                ways.add(neighborEdges[move])
+                cell = neighborCells[move]
+                break
+    return ways
+
+
+def getShortestPathsWaysOf(pawn, game) :
+    # ways on any shortest path of the pawn to the nearest cells of its goal line
+    # (the edges of the shortest path DAG), as a set of edges. Empty if there is no path.
+    # Breadth first search from the pawn, then back from the goal cells.
+    openEdges = game.openEdges
+    dist = [-1] * 81
+    start = pawn.position.row * 9 + pawn.position.col
+    dist[start] = 0
+    queue = [start]
+    goalRow = pawn.goalRow
+    goalDist = -1
+    for cell in queue :
+        if (goalDist >= 0 and dist[cell] > goalDist) :
+            break
+        if (cell // 9 == goalRow) :
+            goalDist = dist[cell]
+            continue
+        neighborEdges = NEIGHBOR_EDGES[cell]
+        for move in range(4) :
+            if (openEdges[neighborEdges[move]]) :
+                nextCell = NEIGHBOR_CELLS[cell][move]
+                if (dist[nextCell] < 0) :
+                    dist[nextCell] = dist[cell] + 1
+                    queue.append(nextCell)
+    
+    ways = set()
+    if (goalDist < 0) :
+        return ways
+    
+    onPaths = [False] * 81
+    backQueue = []
+    for col in range(9) :
+        if (dist[goalRow * 9 + col] == goalDist) :
+            onPaths[goalRow * 9 + col] = True
+            backQueue.append(goalRow * 9 + col)
+    for cell in backQueue :
+        neighborEdges = NEIGHBOR_EDGES[cell]
+        for move in range(4) :
+            edge = neighborEdges[move]
+            if (openEdges[edge]) :
+                prevCell = NEIGHBOR_CELLS[cell][move]
+                if (dist[prevCell] == dist[cell] - 1) :
+                    ways.add(edge)
+                    if (not onPaths[prevCell]) :
+                        onPaths[prevCell] = True
+                        backQueue.append(prevCell)
+    
+    return ways
+
 
 def indicesOfValueIn2DArray(arr2D, value):
     t = []
@@ -603,6 +1033,33 @@ def setWallsBesidePawn(wall2DArrays, pawn) :
             
         
     
+def masksFrom2DArrays(wall2DArrays) :
+    # (horizontal mask, vertical mask) of {"horizontal": 8 by 8 2D bool array, "vertical": 8 by 8 2D bool array}
+    horizontal = 0
+    vertical = 0
+    for row in range(8) :
+        for col in range(8) :
+            if wall2DArrays["horizontal"][row][col] :
+                horizontal |= 1 << (row * 8 + col)
+            if wall2DArrays["vertical"][row][col] :
+                vertical |= 1 << (row * 8 + col)
+    return horizontal, vertical
+
+
+def mask2DArray(mask, numRows, numCols) :
+    return [[bool((mask >> (row * numCols + col)) & 1) for col in range(numCols)] for row in range(numRows)]
+
+
+# walls beside a pawn standing on each cell (see setWallsBesidePawn): (horizontal mask, vertical mask)
+WALLS_BESIDE_CELL = []
+for _cell in range(81) :
+    _pawn = Pawn(None, None, None, forClone = True)
+    _pawn.position = PawnPosition(_cell // 9, _cell % 9)
+    _wall2DArrays = {"horizontal": initialBoard(8, 8, False), "vertical": initialBoard(8, 8, False)}
+    setWallsBesidePawn(_wall2DArrays, _pawn)
+    WALLS_BESIDE_CELL.append(masksFrom2DArrays(_wall2DArrays))
+
+
 def logicalAndBetween2DArray(arr2DA, arr2DB) :
     arr2D = []
     for i in range(len(arr2DA)) :
@@ -4,9 +4,13 @@ from utils import *
 from montecarloSearch import *
 from draw_board import Drawer, cls
 from time import sleep
+import os
+import openingBook as OPENING_BOOK
 
 numOfMCTSSimulations = 3000
 uctConst = 0.4
+numOfWorkers = 1   # more than 1 spreads the simulations over worker processes (root parallel search)
+timeBudgetMs = None   # if set, each AI search also stops when this time budget runs out
 
 print("Do you want to play first?")
 isHumanPlayerFirst = get_boolean_input("Enter 'yes' or 'no': ")
@@ -15,6 +19,12 @@ numOfMCTSSimulations = get_numOfMCTSSimulations(f"Please enter integer for the n
                                                 \nDefault value is : {numOfMCTSSimulations} \n")
 
 game = Game(isHumanPlayerFirst)
+persistentSearch = PersistentSearch()   # reuses the search tree between AI moves
+latencyRecorder = LatencyRecorder()
+transpositionTable = TranspositionTable()   # statistics shared between transposed positions, kept for the whole game
+openingBook = OPENING_BOOK.OpeningBook() if os.path.exists(OPENING_BOOK.DEFAULT_PATH) else None   # built by openingBook.py
+searchOptions = SearchOptions(numOfWorkers=numOfWorkers, timeBudgetMs=timeBudgetMs, persistentSearch=persistentSearch,
+                              transpositionTable=transpositionTable, latencyRecorder=latencyRecorder, openingBook=openingBook)
 drawer = Drawer(isHumanPlayerFirst)
 
 stop = False
@@ -77,7 +87,7 @@ while True :
     while not move_accepted : 
         # Choose another move
         #move = drawer.get_move()
-        move = chooseNextMove(game=game, uctConst=uctConst, numOfMCTSSimulations=numOfMCTSSimulations)
+        move = chooseNextMove(game=game, uctConst=uctConst, numOfMCTSSimulations=numOfMCTSSimulations, options=searchOptions)
         if move[0]:
             move_aj = [[move[0][0] - game.getPawnAtTurn(returnTurn = True).position.row , 
                      move[0][1] - game.getPawnAtTurn(returnTurn = True).position.col], None, None]
@@ -121,3 +131,5 @@ while True :
 
 
 
+
+print(f"AI search latency percentiles (ms): {latencyRecorder.percentiles()}")
@@ -1,84 +1,431 @@
 import numpy as np
+import math
 import random
 import game as GAME
+import batchSimulator as BATCH_SIMULATOR
 #from game import *
 import copy
 import time
+import multiprocessing
+from collections import OrderedDict
+from array import array
 
-class Node :
-    def __init__(self, move, parent, uctConst) :
-        # move is one of the following.
-        # [[row, col], None, None] for moving pawn
-        # [None, [row, col], None] for placing horizontal wall
-        # [None, None, [row, col]] for placing vertical wall
-        self.move = move
-        self.parent = parent
+# Moves of the search tree are encoded as small ints (move codes):
+# pawn move to (row, col): row * 9 + col,
+# horizontal wall at (row, col): 81 + row * 8 + col,
+# vertical wall at (row, col): 145 + row * 8 + col.
+NO_MOVE = 0xFFFF   # move code of a root
+# legality of a node's move (NodeStore.legality)
+LEGAL = 0
+UNCHECKED = 1
+ILLEGAL = 2
+MOVES_OF_CODES = ([[[code // 9, code % 9], None, None] for code in range(81)]
+                  + [[None, [wall // 8, wall % 8], None] for wall in range(64)]
+                  + [[None, None, [wall // 8, wall % 8]] for wall in range(64)])
+# evaluation of a playout stopped by maxPlayoutPlies (see evaluatePosition),
+# fitted by logistic regression on the results of random playouts from the positions of benchmarks/common.py
+# (python benchmarks/fitEvaluation.py, rounded).
+# The lead of pawn 0 is in steps: the difference of distances to the goal lines,
+# plus the pawn to move and the walls left, at these many steps each.
+EVALUATION_TEMPO_STEPS = 0.35
+EVALUATION_WALL_STEPS = 0.44
+EVALUATION_STEP_WEIGHT = 0.69
+
+def encodeMove(move) :
+    if (move[0]) :
+        return move[0][0] * 9 + move[0][1]
+    elif (move[1]) :
+        return 81 + move[1][0] * 8 + move[1][1]
+    else :
+        return 145 + move[2][0] * 8 + move[2][1]
+
+def decodeMove(code) :
+    # a new list, so that the caller can keep it
+    return [None if t is None else list(t) for t in MOVES_OF_CODES[code]]
+
+
+class NodeStore :
+    # the nodes of a search tree as a structure of arrays, a node is an index to the arrays.
+    # Children of a node are contiguous: firstChild[i], ..., firstChild[i] + numChildren[i] - 1.
+    # Only the first numUnlocked[i] of them are selectable (progressive widening), the rest are
+    # locked candidates, leaves not played yet (see MonteCarloTreeSearch.widen).
+    # Children whose move is ILLEGAL are never selected (see MonteCarloTreeSearch.verify).
+    # The store holds at most maxNodes nodes, about 44 bytes per node.
+    MIN_CHILDREN_TO_VECTORIZE = 40   # maxUCTChild uses NumPy from this number of children
+
+    def __init__(self, uctConst, maxNodes = 1000000) :
         self.uctConst = uctConst
-        self.numWins = 0   
-        self.numSims = 0   # number of simulations
-        self.children = []
-        self.isTerminal = False
-    
+        self.maxNodes = maxNodes
+        self.wins = array("d")
+        self.sims = array("q")
+        self.parent = array("i")
+        self.firstChild = array("i")
+        self.numChildren = array("i")
+        self.numUnlocked = array("i")
+        self.moveCode = array("H")
+        self.terminal = array("b")
+        self.legality = array("b")   # LEGAL, UNCHECKED (walls added by expansion) or ILLEGAL (dropped)
+        self.hashes = array("Q")   # Zobrist hash of the position of the node, for the transposition table
 
-    def isLeaf(self) :
-        return len(self.children) == 0
-    
-    def uct(self) :
-        if (self.parent is None or self.parent.numSims == 0) :
+    def __len__(self) :
+        return len(self.parent)
+
+    def allocate(self, count) :
+        # appends count zeroed nodes, returns the index of the first one or -1 if the store is full.
+        first = len(self.parent)
+        if (first + count > self.maxNodes) :
+            return -1
+        for arr in (self.wins, self.sims, self.parent, self.firstChild,
+                    self.numChildren, self.numUnlocked, self.moveCode, self.terminal, self.legality, self.hashes) :
+            arr.frombytes(bytes(arr.itemsize * count))
+        return first
+
+    def newRoot(self, h = None) :
+        index = self.allocate(1)
+        self.parent[index] = -1
+        self.firstChild[index] = -1
+        self.moveCode[index] = NO_MOVE
+        if (not h is None) :
+            self.hashes[index] = h
+        return index
+
+    def addChildren(self, index, moveCodes, hashes = None, stats = None, numUnlocked = None, numOfCheckedChildren = None) :
+        # gives the node (a leaf) its children at once, returns the index of the first child or -1 if the store is full.
+        # stats are initial (numWins, numSims) of the children or None for each.
+        # The first numUnlocked children are unlocked, all of them by default.
+        # The children after the first numOfCheckedChildren are UNCHECKED, none of them by default.
+        count = len(moveCodes)
+        first = self.allocate(count)
+        if (first < 0) :
+            return -1
+        end = first + count
+        self.moveCode[first:end] = array("H", moveCodes)
+        if (not hashes is None) :
+            self.hashes[first:end] = array("Q", hashes)
+        self.parent[first:end] = array("i", [index]) * count
+        self.firstChild[first:end] = array("i", [-1]) * count
+        if (not numOfCheckedChildren is None and numOfCheckedChildren < count) :
+            self.legality[first + numOfCheckedChildren:end] = array("b", [UNCHECKED]) * (count - numOfCheckedChildren)
+        if (not stats is None) :
+            for i in range(count) :
+                if (not stats[i] is None) :
+                    self.wins[first + i], self.sims[first + i] = stats[i]
+        self.firstChild[index] = first
+        self.numUnlocked[index] = count if numUnlocked is None else min(numUnlocked, count)
+        self.numChildren[index] = count
+        return first
+
+    def appendChildren(self, index, moveCodes, hashes = None) :
+        # adds locked children to a node which may have children already.
+        # The children are moved to a new block (the old block is left unused), returns the index of the first new child.
+        oldFirst = self.firstChild[index]
+        oldCount = self.numChildren[index]
+        if (oldCount == 0) :
+            return self.addChildren(index, moveCodes, hashes, numUnlocked = 0)
+        first = self.allocate(oldCount + len(moveCodes))
+        if (first < 0) :
+            return -1
+        self.copyNodes(self, oldFirst, first, oldCount)
+        for child in range(first, first + oldCount) :
+            for grandChild in range(self.firstChild[child], self.firstChild[child] + self.numChildren[child]) :
+                self.parent[grandChild] = child
+        newFirst = first + oldCount
+        end = newFirst + len(moveCodes)
+        self.moveCode[newFirst:end] = array("H", moveCodes)
+        if (not hashes is None) :
+            self.hashes[newFirst:end] = array("Q", hashes)
+        self.parent[newFirst:end] = array("i", [index]) * len(moveCodes)
+        self.firstChild[newFirst:end] = array("i", [-1]) * len(moveCodes)
+        self.firstChild[index] = first
+        self.numChildren[index] = end - first
+        return newFirst
+
+    def copyNodes(self, source, sourceFirst, first, count) :
+        # copies the fields of count nodes of the source store, except parent
+        sourceEnd = sourceFirst + count
+        end = first + count
+        self.wins[first:end] = source.wins[sourceFirst:sourceEnd]
+        self.sims[first:end] = source.sims[sourceFirst:sourceEnd]
+        self.firstChild[first:end] = source.firstChild[sourceFirst:sourceEnd]
+        self.numChildren[first:end] = source.numChildren[sourceFirst:sourceEnd]
+        self.numUnlocked[first:end] = source.numUnlocked[sourceFirst:sourceEnd]
+        self.moveCode[first:end] = source.moveCode[sourceFirst:sourceEnd]
+        self.terminal[first:end] = source.terminal[sourceFirst:sourceEnd]
+        self.legality[first:end] = source.legality[sourceFirst:sourceEnd]
+        self.hashes[first:end] = source.hashes[sourceFirst:sourceEnd]
+
+    def extractSubtree(self, index) :
+        # a new store with a copy of the subtree of the node, whose root is index 0.
+        subtree = NodeStore(self.uctConst, self.maxNodes)
+        root = subtree.allocate(1)
+        subtree.copyNodes(self, index, root, 1)
+        subtree.parent[root] = -1
+        subtree.moveCode[root] = NO_MOVE
+        subtree.legality[root] = LEGAL   # the move was done
+        queue = [(index, root)]
+        for oldIndex, newIndex in queue :
+            count = self.numChildren[oldIndex]
+            if (count == 0) :
+                subtree.firstChild[newIndex] = -1
+                continue
+            oldFirst = self.firstChild[oldIndex]
+            first = subtree.allocate(count)
+            subtree.copyNodes(self, oldFirst, first, count)
+            subtree.parent[first:first + count] = array("i", [newIndex]) * count
+            subtree.firstChild[newIndex] = first
+            queue.extend(zip(range(oldFirst, oldFirst + count), range(first, first + count)))
+        return subtree
+
+    def unlockChild(self, index, child) :
+        # unlocks a locked child, swapping it with the first locked child
+        slot = self.firstChild[index] + self.numUnlocked[index]
+        if (child < slot) :
+            return
+        if (child != slot) :
+            for arr in (self.wins, self.sims, self.moveCode, self.terminal, self.legality, self.hashes) :
+                arr[slot], arr[child] = arr[child], arr[slot]
+        self.numUnlocked[index] += 1
+
+    def moveOf(self, index) :
+        return MOVES_OF_CODES[self.moveCode[index]]
+
+    def movesFromRoot(self, index) :
+        # moves from the root to the node. The moves are shared, do not modify them.
+        moves = []
+        while (self.parent[index] >= 0) :
+            moves.append(MOVES_OF_CODES[self.moveCode[index]])
+            index = self.parent[index]
+        moves.reverse()
+        return moves
+
+    def uct(self, index) :
+        parent = self.parent[index]
+        if (parent < 0 or self.sims[parent] == 0) :
             raise Exception("UCT_ERROR")
-        if (self.numSims == 0) :
+        numSims = self.sims[index]
+        if (numSims == 0) :
             return np.inf
         
-        return (self.numWins / self.numSims) + np.sqrt((self.uctConst * np.log(self.parent.numSims)) / self.numSims)
-
-    def winRate(self) :
-        return self.numWins / self.numSims
+        return (self.wins[index] / numSims) + math.sqrt((self.uctConst * math.log(self.sims[parent])) / numSims)
 
-    def maxUCTChild(self) :
+    def maxUCTChild(self, index) :
+        # UCT scores of all children at once: one NumPy expression over the contiguous child block
+        # for wide nodes, a plain loop with the log of the parent computed once for narrow nodes.
+        # Ties are broken randomly. ILLEGAL children are skipped.
+        numSims = self.sims[index]
+        if (numSims == 0) :
+            raise Exception("UCT_ERROR")
+        first = self.firstChild[index]
+        end = first + self.numUnlocked[index]
+        uctConstLog = self.uctConst * math.log(numSims)
+        if (end - first >= NodeStore.MIN_CHILDREN_TO_VECTORIZE) :
+            # slices are copies: views would keep the arrays from growing
+            sims = np.frombuffer(self.sims[first:end], dtype = np.int64)
+            legal = np.frombuffer(self.legality[first:end], dtype = np.int8) != ILLEGAL
+            unvisited = (sims == 0) & legal
+            if (unvisited.any()) :
+                # UCT of unvisited children is infinity
+                maxUCTChildren = np.flatnonzero(unvisited)
+            else :
+                children = np.flatnonzero(legal)
+                sims = sims[children]
+                ucts = np.frombuffer(self.wins[first:end], dtype = np.float64)[children] / sims + np.sqrt(uctConstLog / sims)
+                maxUCTChildren = children[ucts == ucts.max()]
+            return first + int(random.choice(maxUCTChildren))
+        
         maxUCT = -np.inf
-        for i in range(len(self.children)) :
-            uct = self.children[i].uct()
+        sqrt = math.sqrt
+        for child in range(first, end) :
+            if (self.legality[child] == ILLEGAL) :
+                continue
+            childNumSims = self.sims[child]
+            if (childNumSims == 0) :
+                uct = np.inf
+            else :
+                uct = self.wins[child] / childNumSims + sqrt(uctConstLog / childNumSims)
             if (uct > maxUCT) :
                 maxUCT = uct
-                maxUCTIndices = [i]  
+                maxUCTChildren = [child]
             elif (uct == maxUCT) :
-                maxUCTIndices.append(i)
-        maxUCTIndex = random.choice(maxUCTIndices)
+                maxUCTChildren.append(child)
+        return random.choice(maxUCTChildren)
+
+    def maxWinRateChild(self, index) :
+        first = self.firstChild[index]
+        maxWinRate = -np.inf
+        for child in range(first, first + self.numUnlocked[index]) :
+            if (self.legality[child] == ILLEGAL) :
+                continue
+            winRate = self.wins[child] / self.sims[child]
+            if (winRate > maxWinRate) :
+                maxWinRate = winRate
+                maxWinRateChild = child
+        return maxWinRateChild
+
+    def maxSimsChild(self, index) :
+        first = self.firstChild[index]
+        maxSims = -np.inf
+        for child in range(first, first + self.numUnlocked[index]) :
+            if (self.legality[child] == ILLEGAL) :
+                continue
+            if (self.sims[child] > maxSims) :
+                maxSims = self.sims[child]
+                maxSimsChild = child
+        return maxSimsChild
+
+
+class Node :
+    # a handle to a node of a NodeStore, with the interface of a tree node.
+    # move is one of the following.
+    # [[row, col], None, None] for moving pawn
+    # [None, [row, col], None] for placing horizontal wall
+    # [None, None, [row, col]] for placing vertical wall
+    __slots__ = ("store", "index")
+
+    def __init__(self, store, index) :
+        self.store = store
+        self.index = index
+
+    def __eq__(self, other) :
+        return isinstance(other, Node) and self.store is other.store and self.index == other.index
+
+    def __hash__(self) :
+        return hash((id(self.store), self.index))
+
+    @property
+    def move(self) :
+        code = self.store.moveCode[self.index]
+        return None if code == NO_MOVE else decodeMove(code)
+
+    @property
+    def parent(self) :
+        parent = self.store.parent[self.index]
+        return None if parent < 0 else Node(self.store, parent)
+
+    @property
+    def uctConst(self) :
+        return self.store.uctConst
+
+    @property
+    def children(self) :
+        first = self.store.firstChild[self.index]
+        legality = self.store.legality
+        return [Node(self.store, child) for child in range(first, first + self.store.numUnlocked[self.index]) if legality[child] != ILLEGAL]
 
-        return self.children[maxUCTIndex]
+    @property
+    def numWins(self) :
+        return self.store.wins[self.index]
+
+    @numWins.setter
+    def numWins(self, value) :
+        self.store.wins[self.index] = value
+
+    @property
+    def numSims(self) :
+        # number of simulations
+        return self.store.sims[self.index]
+
+    @numSims.setter
+    def numSims(self, value) :
+        self.store.sims[self.index] = value
+
+    @property
+    def isTerminal(self) :
+        return self.store.terminal[self.index] == 1
+
+    @isTerminal.setter
+    def isTerminal(self, value) :
+        self.store.terminal[self.index] = 1 if value else 0
+
+    # Zobrist hash of the position of this node, for the transposition table
+    @property
+    def hash(self) :
+        return self.store.hashes[self.index]
+
+    @hash.setter
+    def hash(self, value) :
+        self.store.hashes[self.index] = value
+
+    def isLeaf(self) :
+        return self.store.numChildren[self.index] == 0
+    
+    def uct(self) :
+        return self.store.uct(self.index)
+
+    def winRate(self) :
+        return self.numWins / self.numSims
+
+    def maxUCTChild(self) :
+        return Node(self.store, self.store.maxUCTChild(self.index))
 
     def maxWinRateChild(self) :
-        maxWinRate = -np.inf
-        for i in range(len(self.children)) :
-            if (self.children[i].winRate() > maxWinRate) :
-                maxWinRate = self.children[i].winRate()
-                maxWinRateIndex = i  
-            
-        return self.children[maxWinRateIndex]
+        return Node(self.store, self.store.maxWinRateChild(self.index))
     
     def maxSimsChild(self) :
-        maxSims = -np.inf
-        for i in range(len(self.children)) :
-            if (self.children[i].numSims > maxSims) :
-                maxSims = self.children[i].numSims
-                maxSimsIndex = i  
-            
-        
-        return self.children[maxSimsIndex]
+        return Node(self.store, self.store.maxSimsChild(self.index))
 
-    def addChild(self,  childNode) :
-        self.children.append(childNode)
-    
     def printChildren(self) :
-        for i in range(len(self.children)) :
-            print(f"children[{i}].move: {self.children[i].move}")
+        children = self.children
+        for i in range(len(children)) :
+            print(f"children[{i}].move: {children[i].move}")
         
     
+class TranspositionTable :
+    # statistics of positions by Zobrist hash, shared between nodes which reach the same position.
+    # numWins is for the pawn who moved into the position, as Node.numWins.
+    # The table is bounded: the least recently used position is evicted first.
+    def __init__(self, maxSize = 200000) :
+        self.maxSize = maxSize
+        self.entries = OrderedDict()   # hash -> [numWins, numSims]
+
+    def __len__(self) :
+        return len(self.entries)
+
+    def lookup(self, h) :
+        entry = self.entries.get(h)
+        if (entry is None) :
+            return None
+        self.entries.move_to_end(h)
+        return entry[0], entry[1]
+
+    def update(self, h, numWins, numSims) :
+        entry = self.entries.get(h)
+        if (entry is None) :
+            entry = [0, 0]
+            self.entries[h] = entry
+            if (len(self.entries) > self.maxSize) :
+                self.entries.popitem(last = False)
+        else :
+            self.entries.move_to_end(h)
+        entry[0] += numWins
+        entry[1] += numSims
+
+
 class MonteCarloTreeSearch :
-    def __init__ (self, game, uctConst) :
+    def __init__ (self, game, uctConst, transpositionTable = None, maxNodes = 1000000, wideningCoeff = None, wideningExponent = 0.5, playoutBatchSize = 1,
+                  useBatchSimulator = False, maxPlayoutPlies = None) :
         self.game = game
+        # one mutable game walked down to a node and back up to the root (see getSimulationGameAtNode)
+        self.simulationGame = copy.deepcopy(game)
+        self.rootDepth = len(self.simulationGame.moveStack)
         self.uctConst = uctConst
-        self.root =  Node(None, None, self.uctConst)
+        self.transpositionTable = transpositionTable
+        # progressive widening (see widen), off if wideningCoeff is None
+        self.wideningCoeff = wideningCoeff
+        self.wideningExponent = wideningExponent
+        # number of playouts run from a leaf at once (see simulate)
+        self.playoutBatchSize = playoutBatchSize
+        # whether batches of playouts are played by batchSimulator, all games at once
+        self.useBatchSimulator = useBatchSimulator
+        # playouts stop after this number of plies and the position is evaluated (see evaluatePosition),
+        # they play to the end if None. batchSimulator always plays to the end.
+        self.maxPlayoutPlies = maxPlayoutPlies
+        self.store = NodeStore(uctConst, maxNodes)
+        self.root = Node(self.store, self.store.newRoot(game.hash))
+        if (not transpositionTable is None) :
+            entry = transpositionTable.lookup(self.root.hash)
+            if (not entry is None) :
+                self.root.numWins, self.root.numSims = entry
         self.totalNumOfSimulations = 0
     
     # Returns max depth for a node
@@ -91,100 +438,291 @@ class MonteCarloTreeSearch :
         return max
     
 
-    def search(self, numOfSimulations) :
-        uctConst = self.uctConst
-
+    def search(self, numOfSimulations = None, timeBudgetMs = None, checkInterval = 16) :
+        # stops after numOfSimulations playouts or when the time budget runs out, whichever comes first.
+        # the clock is checked every checkInterval iterations.
+        # selectBestMove can be called from another thread while searching.
+        # The root is expanded first whatever the limits, so that there is always a move to select.
+        if (numOfSimulations is None and timeBudgetMs is None) :
+            raise ValueError("search needs numOfSimulations or timeBudgetMs")
         currentNode = self.root   
-        limitOfTotalNumOfSimulations = self.totalNumOfSimulations + numOfSimulations
+        if (numOfSimulations is None) :
+            limitOfTotalNumOfSimulations = np.inf
+        else :
+            limitOfTotalNumOfSimulations = self.totalNumOfSimulations + numOfSimulations
+        deadline = None
+        if (not timeBudgetMs is None) :
+            deadline = time.monotonic() + timeBudgetMs / 1000
+        
+        self.expandRoot()
+        numOfIterations = 0
         while (self.totalNumOfSimulations < limitOfTotalNumOfSimulations) :         
+            numOfIterations += 1
+            if (not deadline is None and numOfIterations % checkInterval == 0 and time.monotonic() >= deadline) :
+                break
+            
+            numOfPlayouts = int(min(self.playoutBatchSize, limitOfTotalNumOfSimulations - self.totalNumOfSimulations))
             # Selection
             if (currentNode.isTerminal) :
-                self.playout(currentNode)
+                self.playout(currentNode, numOfPlayouts)
                 currentNode = self.root
             elif (currentNode.isLeaf()) :
                 if (currentNode.numSims == 0) :
-                    self.playout(currentNode)
+                    self.playout(currentNode, numOfPlayouts)
                     currentNode = self.root
                 else :
-                    # Expansion
-                    simulationGame = self.getSimulationGameAtNode(currentNode)
-                    if (simulationGame.getPawnAtTurn(returnTurn= False).numberOfLeftWalls > 0) :
-                        nextPositionTuples = simulationGame.getArrOfValidNextPositionTuples()
-                        for i in range(len(nextPositionTuples)) :
-                            move = [nextPositionTuples[i], None, None]
-                            childNode = Node(move, currentNode, uctConst) 
-                            currentNode.addChild(childNode)
-                        
-                        if (simulationGame.getPawnAtTurn(returnTurn= True).numberOfLeftWalls > 0) :
-                            noBlockNextHorizontals = simulationGame.getArrOfValidNoBlockNextHorizontalWallPositions()
-                            for i in range(len(noBlockNextHorizontals)): 
-                                move = [None, noBlockNextHorizontals[i], None]
-                                childNode = Node(move, currentNode, uctConst) 
-                                currentNode.addChild(childNode)
-                            
-                            noBlockNextVerticals = simulationGame.getArrOfValidNoBlockNextVerticalWallPositions ()
-                            for i in range(len(noBlockNextVerticals)) :
-                                move = [None, None, noBlockNextVerticals[i]]
-                                childNode = Node(move, currentNode, uctConst) 
-                                currentNode.addChild(childNode)
-                            
-                        
+                    self.expand(currentNode)
+                    if (currentNode.isTerminal or currentNode.isLeaf()) :
+                        # terminal, or not expanded because the node store is full
+                        self.playout(currentNode, numOfPlayouts)
                     else :
-                        # heuristic:
-                        # If opponent has no walls left,
-                        # my pawn moves only to one of the shortest paths.
-                        nextPositions = chooseShortestPathNextPawnPositionsThoroughly(simulationGame)
-                        for i in range(len(nextPositions)) :
-                            nextPosition = nextPositions[i]
-                            move = [[nextPosition.row, nextPosition.col], None, None]
-                            childNode = Node(move, currentNode, uctConst)
-                            currentNode.addChild(childNode)
-                        
-                        if (simulationGame.getPawnAtTurn(returnTurn= True).numberOfLeftWalls > 0) :
-                            # heuristic:
-                            # if opponent has no walls left,
-                            # place walls only to interrupt the opponent's path,
-                            # not to support my pawn.
-                            noBlockNextWallsInterupt = GAME.getArrOfValidNoBlockNextWallsDisturbPathOf(
-                                simulationGame.getPawnAtTurn(returnTurn= False), simulationGame)
-                            noBlockNextHorizontalsInterupt = noBlockNextWallsInterupt["horizontal"]
-                            for i in range(len(noBlockNextHorizontalsInterupt)) :
-                                move = [None, noBlockNextHorizontalsInterupt[i], None]
-                                childNode = Node(move, currentNode, uctConst)
-                                currentNode.addChild(childNode)
-                            
-                            noBlockNextVerticalsInterupt = noBlockNextWallsInterupt["vertical"]
-                            for i in range(len(noBlockNextVerticalsInterupt)) :
-                                move = [None, None, noBlockNextVerticalsInterupt[i]]
-                                childNode = Node(move, currentNode, uctConst)
-                                currentNode.addChild(childNode)
-                            
-                        
-                    
-                    self.playout(random.choice(currentNode.children))
+                        self.playout(self.selectRandomChild(currentNode), numOfPlayouts)
                     currentNode = self.root
                 
             else :
-                currentNode = currentNode.maxUCTChild()
-    
+                self.widen(currentNode)
+                currentNode = self.selectChild(currentNode)
+
+    def expandRoot(self) :
+        # plays out and expands a leaf root the way the first iterations of search do
+        root = self.root
+        if (root.isTerminal or not root.isLeaf()) :
+            return
+        if (root.numSims == 0) :
+            self.playout(root, self.playoutBatchSize)
+        self.expand(root)
+        if (not root.isTerminal and not root.isLeaf()) :
+            self.playout(self.selectRandomChild(root), self.playoutBatchSize)
+
+    def expand(self, node, simulationGame = None) :
+        simulationGame = self.getSimulationGameAtNode(node, simulationGame)
+        if (not simulationGame.winner is None) :
+            # a node with statistics from the transposition table can be terminal but not yet played out
+            node.isTerminal = True
+            self.restoreSimulationGame(simulationGame)
+            return
+        
+        # Walls are added without checking if they block a path, they are checked when first selected (see verify).
+        moves = []
+        horizontals = None
+        verticals = None
+        if (simulationGame.getPawnAtTurn(returnTurn= False).numberOfLeftWalls > 0) :
+            nextPositionTuples = simulationGame.getArrOfValidNextPositionTuples()
+            for i in range(len(nextPositionTuples)) :
+                move = [nextPositionTuples[i], None, None]
+                moves.append(move)
+            
+            if (simulationGame.getPawnAtTurn(returnTurn= True).numberOfLeftWalls > 0) :
+                validNextWalls = simulationGame.validNextWalls
+                horizontals = GAME.indicesOfValueIn2DArray(validNextWalls["horizontal"], True)
+                verticals = GAME.indicesOfValueIn2DArray(validNextWalls["vertical"], True)
+            
+        else :
+            # heuristic:
+            # If opponent has no walls left,
+            # my pawn moves only to one of the shortest paths.
+            nextPositions = chooseShortestPathNextPawnPositionsThoroughly(simulationGame)
+            for i in range(len(nextPositions)) :
+                nextPosition = nextPositions[i]
+                move = [[nextPosition.row, nextPosition.col], None, None]
+                moves.append(move)
+            
+            if (simulationGame.getPawnAtTurn(returnTurn= True).numberOfLeftWalls > 0) :
+                # heuristic:
+                # if opponent has no walls left,
+                # place walls only to interrupt the opponent's path,
+                # not to support my pawn.
+                nextWallsInterupt = GAME.getValidNextWallsDisturbPathOf(
+                    simulationGame.getPawnAtTurn(returnTurn= False), simulationGame)
+                horizontals = GAME.indicesOfValueIn2DArray(nextWallsInterupt["horizontal"], True)
+                verticals = GAME.indicesOfValueIn2DArray(nextWallsInterupt["vertical"], True)
+            
+        numOfPawnMoves = len(moves)
+        numUnlocked = None
+        if (not horizontals is None) :
+            if (self.wideningCoeff is None) :
+                moves.extend([None, horizontal, None] for horizontal in horizontals)
+                moves.extend([None, None, vertical] for vertical in verticals)
+            else :
+                # pawn moves and the best walls by prior are unlocked, the other walls are locked candidates
+                moves.extend(getWallMovesByPrior(simulationGame, horizontals, verticals))
+                numUnlocked = numOfPawnMoves + self.numOfWallsToUnlock(node.numSims)
+        
+        transpositionTable = self.transpositionTable
+        hashes = None
+        stats = None
+        if (not transpositionTable is None) :
+            hashes = [simulationGame.hashAfterMove(move) for move in moves]
+            # children start with the statistics of their positions reached before
+            stats = [transpositionTable.lookup(h) for h in hashes]
+        self.restoreSimulationGame(simulationGame)
+        self.store.addChildren(node.index, [encodeMove(move) for move in moves], hashes, stats, numUnlocked, numOfPawnMoves)
+
+    def numOfWallsToUnlock(self, numSims) :
+        return int(self.wideningCoeff * numSims ** self.wideningExponent)
+
+    def widen(self, node) :
+        # progressive widening:
+        # unlocks more wall children of the node, in the order of their prior, as its number of simulations grows.
+        if (self.wideningCoeff is None) :
+            return
+        store = self.store
+        index = node.index
+        first = store.firstChild[index]
+        numOfPawnMoves = 0
+        while (numOfPawnMoves < store.numChildren[index] and store.moveCode[first + numOfPawnMoves] < 81) :
+            numOfPawnMoves += 1
+        numOfChildrenToUnlock = min(numOfPawnMoves + self.numOfWallsToUnlock(store.sims[index]), store.numChildren[index])
+        if (store.numUnlocked[index] < numOfChildrenToUnlock) :
+            store.numUnlocked[index] = numOfChildrenToUnlock
+
+    def verify(self, node, simulationGame = None) :
+        # a wall child is checked for blocking a path when it is first selected.
+        # Returns False if it does, then the child is dropped: it is never selected again.
+        store = self.store
+        index = node.index
+        if (store.legality[index] == UNCHECKED) :
+            parent = Node(store, store.parent[index])
+            simulationGame = self.getSimulationGameAtNode(parent, simulationGame)
+            # the verdicts of all the walls come at once (see game.Game.noBlockWalls),
+            # so all the unchecked children of the parent are checked with this one.
+            noBlockWalls = simulationGame.noBlockWalls()
+            self.restoreSimulationGame(simulationGame)
+            first = store.firstChild[parent.index]
+            for child in range(first, first + store.numChildren[parent.index]) :
+                if (store.legality[child] == UNCHECKED) :
+                    store.legality[child] = LEGAL if isNoBlockWallMove(noBlockWalls, store.moveOf(child)) else ILLEGAL
+        return store.legality[index] == LEGAL
+
+    def selectChild(self, node, simulationGame = None) :
+        # maxUCTChild, verified
+        while True :
+            child = node.maxUCTChild()
+            if (self.verify(child, simulationGame)) :
+                return child
+
+    def selectRandomChild(self, node, simulationGame = None) :
+        # a random child, verified
+        children = node.children
+        while True :
+            child = random.choice(children)
+            if (self.verify(child, simulationGame)) :
+                return child
+            children.remove(child)
+
+    def searchRootParallel(self, numOfSimulations, numOfWorkers, seed = None, timeBudgetMs = None) :
+        # root parallelization:
+        # each worker process searches its own tree with its own seed,
+        # then statistics of root children are merged by move into this tree.
+        if (numOfSimulations is None and timeBudgetMs is None) :
+            raise ValueError("searchRootParallel needs numOfSimulations or timeBudgetMs")
+        if (seed is None) :
+            seed = random.randrange(2**31)
+        
+        workerArgs = []
+        for i in range(numOfWorkers) :
+            workerNumOfSimulations = None
+            if (not numOfSimulations is None) :
+                workerNumOfSimulations = numOfSimulations // numOfWorkers
+                if (i < numOfSimulations % numOfWorkers) :
+                    workerNumOfSimulations += 1
+            workerArgs.append((self.game, self.uctConst, workerNumOfSimulations, seed + i, timeBudgetMs,
+                               self.wideningCoeff, self.wideningExponent, self.playoutBatchSize, self.useBatchSimulator,
+                               self.maxPlayoutPlies))
+        
+        with multiprocessing.Pool(numOfWorkers) as pool :
+            results = pool.map(searchWorker, workerArgs)
+        
+        # root children missing in this tree are added first (UNCHECKED) and unlocked with the other children
+        # which have statistics, then the statistics are summed up by move code.
+        # A move verified by a worker is LEGAL.
+        store = self.store
+        rootIndex = self.root.index
+        first = store.firstChild[rootIndex]
+        existingMoveCodes = set(store.moveCode[first:first + store.numChildren[rootIndex]])
+        newMoveCodes = []
+        mergedMoveCodes = set()
+        for rootChildrenStats, totalNumOfSimulations in results :
+            for move, numWins, numSims, legality in rootChildrenStats :
+                code = encodeMove(move)
+                mergedMoveCodes.add(code)
+                if (not code in existingMoveCodes) :
+                    existingMoveCodes.add(code)
+                    newMoveCodes.append(code)
+        if (len(newMoveCodes) > 0) :
+            hashes = None
+            if (not self.transpositionTable is None) :
+                hashes = [self.game.hashAfterMove(MOVES_OF_CODES[code]) for code in newMoveCodes]
+            newFirst = store.appendChildren(rootIndex, newMoveCodes, hashes)
+            store.legality[newFirst:newFirst + len(newMoveCodes)] = array("b", [UNCHECKED]) * len(newMoveCodes)
+        
+        first = store.firstChild[rootIndex]
+        for child in range(first + store.numUnlocked[rootIndex], first + store.numChildren[rootIndex]) :
+            if (store.moveCode[child] in mergedMoveCodes) :
+                store.unlockChild(rootIndex, child)
+        
+        childByMoveCode = {}
+        for child in range(first, first + store.numChildren[rootIndex]) :
+            childByMoveCode[store.moveCode[child]] = child
+        
+        for rootChildrenStats, totalNumOfSimulations in results :
+            self.totalNumOfSimulations += totalNumOfSimulations
+            for move, numWins, numSims, legality in rootChildrenStats :
+                child = childByMoveCode[encodeMove(move)]
+                if (legality == LEGAL) :
+                    store.legality[child] = LEGAL
+                store.wins[child] += numWins
+                store.sims[child] += numSims
+                store.sims[rootIndex] += numSims
+
+    def reroot(self, game, moves) :
+        # reuses the subtree reached by the moves done since the root (e.g. AI's move and human's reply).
+        # game is the game after the moves. The rest of the tree is freed.
+        store = self.store
+        newRoot = self.root.index
+        for move in moves :
+            code = encodeMove(move)
+            matchedChild = -1
+            first = store.firstChild[newRoot]
+            for child in range(first, first + store.numChildren[newRoot]) :
+                if (store.moveCode[child] == code) :
+                    matchedChild = child
+                    break
+            newRoot = matchedChild
+            if (newRoot < 0) :
+                break
+        
+        # the subtree is copied to a new store, so that the memory of the rest of the tree is freed
+        if (newRoot < 0) :
+            self.store = NodeStore(self.uctConst, store.maxNodes)
+            self.root = Node(self.store, self.store.newRoot(game.hash))
+        else :
+            self.store = store.extractSubtree(newRoot)
+            self.root = Node(self.store, 0)
+        self.game = game
+        self.simulationGame = copy.deepcopy(game)
+        self.rootDepth = len(self.simulationGame.moveStack)
 
     def selectBestMove(self,) :
+        # anytime: this can be called while searching, also from another thread.
+        # returns None if nothing is searched yet.
+        children = self.root.children
+        if (len(children) == 0) :
+            return None
         best = self.root.maxSimsChild()
-        return {"move": best.move, "winRate": best.winRate()}
+        winRate = best.winRate() if best.numSims > 0 else 0.0
+        return {"move": best.move, "winRate": winRate}
     
     
-    def getSimulationGameAtNode(self, node) :
-        simulationGame = copy.deepcopy(self.game)
-        stack = []
-
-        ancestor = node
-        while(not ancestor.parent is  None) :
-            stack.append(ancestor.move) # moves stacked to a child of root. root's move is not stacked.
-            ancestor = ancestor.parent
+    def getSimulationGameAtNode(self, node, simulationGame = None) :
+        # moves the simulation game (self.simulationGame by default) from the root to the node.
+        # call restoreSimulationGame after use.
+        if (simulationGame is None) :
+            simulationGame = self.simulationGame
+        moves = self.store.movesFromRoot(node.index) # root's move is not included.
         #print("before ", simulationGame.getPawn0().position)
         #print("before ", simulationGame.getPawn1().position)
-        while (len(stack) > 0) :
-            move = stack.pop()
+        for move in moves :
             #print("MOVE : ", move)
             simulationGame.doMove(move)
             #print(simulationGame.getPawn0().position)
@@ -193,10 +731,25 @@ class MonteCarloTreeSearch :
         #print("winner ",simulationGame.winner)
         return simulationGame
 
+    def restoreSimulationGame(self, simulationGame = None) :
+        # undo every move done after the root
+        if (simulationGame is None) :
+            simulationGame = self.simulationGame
+        while (len(simulationGame.moveStack) > self.rootDepth) :
+            simulationGame.undoMove()
+
     
-    def playout(self, node) :
-        self.totalNumOfSimulations +=1
-        simulationGame = self.getSimulationGameAtNode(node)  # to be checked
+    def playout(self, node, numOfPlayouts = 1) :
+        self.totalNumOfSimulations += numOfPlayouts
+        numOfWins, nodePawnIndex = self.simulate(node, numOfPlayouts = numOfPlayouts)
+        self.backpropagate(node, numOfWins, nodePawnIndex)
+
+    def simulate(self, node, simulationGame = None, numOfPlayouts = 1) :
+        # plays numOfPlayouts games randomly from the node.
+        # The position of the node is reconstructed once, and the moves of each game are undone after it.
+        # returns the numbers of wins of pawn 0 and of pawn 1, and the index of the pawn of the node.
+        # A game stopped by maxPlayoutPlies counts as a fraction of a win for each pawn: its evaluation.
+        simulationGame = self.getSimulationGameAtNode(node, simulationGame)  # to be checked
         
         # the pawn of this node is the pawn who moved immediately before,
         # put it another way, the pawn who leads to this node right before,
@@ -205,44 +758,43 @@ class MonteCarloTreeSearch :
         if not simulationGame.winner is None : # to be checked
             node.isTerminal = True
         
-        #print(node.move)
-        #print(simulationGame.winner)
+        numOfWins = [0, 0]
+        if (self.useBatchSimulator and numOfPlayouts > 1 and simulationGame.winner is None) :
+            winners = BATCH_SIMULATOR.simulate([simulationGame] * numOfPlayouts)
+            numOfWins[1] = int(np.count_nonzero(winners))
+            numOfWins[0] = numOfPlayouts - numOfWins[1]
+            self.restoreSimulationGame(simulationGame)
+            return numOfWins, nodePawnIndex
+        
+        nodeDepth = len(simulationGame.moveStack)
+        for i in range(numOfPlayouts) :
+            winnerIndex = self.playRandomly(simulationGame, self.maxPlayoutPlies)
+            if (winnerIndex is None) :
+                winProbability = evaluatePosition(simulationGame)
+                numOfWins[0] += winProbability
+                numOfWins[1] += 1 - winProbability
+            else :
+                numOfWins[winnerIndex] += 1
+            while (len(simulationGame.moveStack) > nodeDepth) :
+                simulationGame.undoMove()
+        
+        self.restoreSimulationGame(simulationGame)
+        return numOfWins, nodePawnIndex
+
+    def playRandomly(self, simulationGame, maxPlies = None) :
+        # plays the simulation game randomly to the end, returns the index of the winner pawn,
+        # or None if maxPlies plies are played before the end.
         # Simulation
-        cacheForPawns = [
-            {
-                "updated": False,
-                "prev": None,
-                "next": None,
-                "distanceToGoal": None
-            },
-            {
-                "updated": False,
-                "prev": None,
-                "next": None,
-                "distanceToGoal": None
-            }
-        ]
+        # The distances to the goal lines are kept by the game (see game.Game.distancesToGoal),
+        # so no search is needed here, even after a wall is placed.
         pawnMoveFlag = False
         
+        numOfPlies = 0
         while (simulationGame.winner is None) :
-            if ( not cacheForPawns[0]["updated"]) :
-                
-                t = get2DArrayPrevAndNextAndDistanceToGoalFor(simulationGame.getPawn0(), simulationGame)
-                cacheForPawns[0]["prev"] = t[0]
-                cacheForPawns[0]["next"] = t[1]
-                cacheForPawns[0]["distanceToGoal"] = t[2]
-                cacheForPawns[0]["updated"] = True
-            
-            if not cacheForPawns[1]["updated"] :
-                t = get2DArrayPrevAndNextAndDistanceToGoalFor(simulationGame.getPawn1(), simulationGame)
-                cacheForPawns[1]["prev"] = t[0]
-                cacheForPawns[1]["next"] = t[1]
-                cacheForPawns[1]["distanceToGoal"] = t[2]
-                cacheForPawns[1]["updated"] = True
-            
-
+            if (not maxPlies is None and numOfPlies >= maxPlies) :
+                return None
+            numOfPlies += 1
             pawnOfTurn = simulationGame.getPawnAtTurn(returnTurn = True) 
-            pawnIndexOfTurn = simulationGame.turn % 2
             # heuristic:
             # With a certain probability, move pawn to one of the shortest paths.
             # And with the rest probability, half place a wall randomly / half move pawn randomly.
@@ -250,31 +802,13 @@ class MonteCarloTreeSearch :
             if (random.random() < 0.7) :
                 # move pawn to one of shortest paths
                 pawnMoveFlag = False
-                next = cacheForPawns[pawnIndexOfTurn]["next"]
-                currentPosition = pawnOfTurn.position
-                nextPosition = next[currentPosition.row][currentPosition.col]
-                if (nextPosition is None) :
-                    print("Error : Maybe already in goal position")
-                    raise Exception("already in goal Position....") # to be checked : how to raise
-                             
                 if (arePawnsAdjacent(simulationGame)) :
-                    nextNextPosition = next[nextPosition.row][nextPosition.col]
-                    if ((not nextNextPosition is None) and 
-                    (simulationGame.getValidNextPositions()[nextNextPosition.row][nextNextPosition.col] == True)) :
-                        nextPosition = nextNextPosition
-                        cacheForPawns[pawnIndexOfTurn]["distanceToGoal"] -= 2
-                    else :
-                        nextPositions = chooseShortestPathNextPawnPositionsThoroughly(simulationGame)
-                        _nextPosition = random.choice(nextPositions)
-                        if (_nextPosition == nextPosition) : # to be checked
-                            cacheForPawns[pawnIndexOfTurn]["distanceToGoal"] -= 1
-                        else :
-                            nextPosition = _nextPosition
-                            cacheForPawns[pawnIndexOfTurn]["updated"] = False
-                        
-                    
+                    nextPosition = random.choice(chooseShortestPathNextPawnPositionsThoroughly(simulationGame))
                 else :
-                    cacheForPawns[pawnIndexOfTurn]["distanceToGoal"] -= 1
+                    nextPosition = chooseAdjacentPositionAtDistance(simulationGame, pawnOfTurn, -1)
+                    if (nextPosition is None) :
+                        print("Error : Maybe already in goal position")
+                        raise Exception("already in goal Position....") # to be checked : how to raise
                 
                 simulationGame.movePawn(nextPosition.row, nextPosition.col)
             elif ( not pawnMoveFlag and pawnOfTurn.numberOfLeftWalls > 0 ) :
@@ -286,41 +820,132 @@ class MonteCarloTreeSearch :
                 
                 if (not nextMove is None) :
                     simulationGame.doMove(nextMove)
-                    cacheForPawns[0]["updated"] = False
-                    cacheForPawns[1]["updated"] = False
                 else :
                     print("No probable walls possible")
                     pawnMoveFlag = True
                 
             else :
-                # move pawn backwards
+                # move pawn backwards: one step farther from the goal line, or randomly if it is not possible
                 pawnMoveFlag = False
-                #nextRandomPosition = AI.chooseNextPawnPositionRandomly(simulationGame)
-                prev = cacheForPawns[pawnIndexOfTurn]["prev"]
-                currentPosition = pawnOfTurn.position
-                prevPosition = prev[currentPosition.row][currentPosition.col]
-                if ((prevPosition is None) or (not simulationGame.getValidNextPositions()[prevPosition.row][prevPosition.col])) :
-                    prevPosition = chooseNextPawnPositionRandomly(simulationGame) # to be checked
-                    cacheForPawns[pawnIndexOfTurn]["updated"] = False
-                else :
-                    cacheForPawns[pawnIndexOfTurn]["distanceToGoal"] += 1
+                prevPosition = chooseAdjacentPositionAtDistance(simulationGame, pawnOfTurn, 1)
+                if (prevPosition is None) :
+                    prevPosition = chooseNextPawnPositionRandomly(simulationGame)
                 
                 simulationGame.movePawn(prevPosition.row, prevPosition.col)
             
-        # Backpropagation
-        ancestor = node
+        return simulationGame.winner.index
+
+    def backpropagate(self, node, numOfWins, nodePawnIndex) :
+        # numOfWins: numbers of wins of pawn 0 and of pawn 1 in a batch of playouts from the node,
+        # fractional for evaluated playouts
+        transpositionTable = self.transpositionTable
+        store = self.store
+        numOfPlayouts = round(numOfWins[0] + numOfWins[1])
+        ancestor = node.index
         ancestorPawnIndex = nodePawnIndex
-        while(not ancestor is None) :
-            ancestor.numSims +=1
-            if (simulationGame.winner.index == ancestorPawnIndex) :
-                ancestor.numWins += 1
+        while(ancestor >= 0) :
+            store.sims[ancestor] += numOfPlayouts
+            wins = numOfWins[ancestorPawnIndex]
+            store.wins[ancestor] += wins
+            if (not transpositionTable is None) :
+                transpositionTable.update(store.hashes[ancestor], wins, numOfPlayouts)
             
-            ancestor = ancestor.parent
+            ancestor = store.parent[ancestor]
             ancestorPawnIndex = (ancestorPawnIndex + 1) % 2
         
 
-def chooseNextMove(game, uctConst, numOfMCTSSimulations, verbose=False) :
-        d0 = time.time()
+class PersistentSearch :
+    # keeps the search tree of chooseNextMove from one AI move to the next (see MonteCarloTreeSearch.reroot)
+    def __init__(self) :
+        self.mcts = None
+        self.historyLength = None   # number of moves of the game at the root of mcts
+
+    def getSearch(self, game, uctConst, options) :
+        # a new search with the options (see SearchOptions) for the first move, the kept one after
+        if (self.mcts is None) :
+            return options.newSearch(game, uctConst)
+        
+        moves = game.getMoveHistory()[self.historyLength:]
+        self.mcts.reroot(game, moves)
+        return self.mcts
+
+    def keepSearch(self, game, mcts) :
+        self.mcts = mcts
+        self.historyLength = len(game.moveStack)
+
+
+def searchWorker(args) :
+    # runs in a worker process of MonteCarloTreeSearch.searchRootParallel
+    (game, uctConst, numOfSimulations, seed, timeBudgetMs,
+     wideningCoeff, wideningExponent, playoutBatchSize, useBatchSimulator, maxPlayoutPlies) = args
+    random.seed(seed)
+    mcts = MonteCarloTreeSearch(game, uctConst, wideningCoeff = wideningCoeff, wideningExponent = wideningExponent,
+                                playoutBatchSize = playoutBatchSize, useBatchSimulator = useBatchSimulator,
+                                maxPlayoutPlies = maxPlayoutPlies)
+    mcts.search(numOfSimulations, timeBudgetMs)
+    store = mcts.store
+    rootChildrenStats = [(child.move, child.numWins, child.numSims, store.legality[child.index]) for child in mcts.root.children]
+    return rootChildrenStats, mcts.totalNumOfSimulations
+
+
+class LatencyRecorder :
+    # latencies of chooseNextMove searches, to tune time budgets
+    def __init__(self) :
+        self.latenciesMs = []
+
+    def record(self, latencyMs) :
+        self.latenciesMs.append(latencyMs)
+
+    def percentiles(self, ps = (50, 90, 99)) :
+        if (len(self.latenciesMs) == 0) :
+            return {}
+        values = np.percentile(self.latenciesMs, ps)
+        return {f"p{p}": float(v) for p, v in zip(ps, values)}
+
+
+class SearchOptions :
+    # options of the searches of chooseNextMove, all off by default:
+    # numOfWorkers: more than 1 spreads the simulations over worker processes (see MonteCarloTreeSearch.searchRootParallel),
+    # seed: of the worker processes,
+    # timeBudgetMs: the search also stops when this time budget runs out,
+    # wideningCoeff, playoutBatchSize, useBatchSimulator, maxPlayoutPlies: see MonteCarloTreeSearch,
+    # persistentSearch: a PersistentSearch, to reuse the search tree between moves,
+    # transpositionTable: a TranspositionTable, statistics shared between transposed positions,
+    # latencyRecorder: a LatencyRecorder of the time taken by each move,
+    # openingBook: an OpeningBook (see openingBook.py), moves of its positions are not searched.
+    def __init__(self, numOfWorkers = 1, seed = None, timeBudgetMs = None, wideningCoeff = None, playoutBatchSize = 1,
+                 useBatchSimulator = False, maxPlayoutPlies = None, persistentSearch = None, transpositionTable = None,
+                 latencyRecorder = None, openingBook = None) :
+        self.numOfWorkers = numOfWorkers
+        self.seed = seed
+        self.timeBudgetMs = timeBudgetMs
+        self.wideningCoeff = wideningCoeff
+        self.playoutBatchSize = playoutBatchSize
+        self.useBatchSimulator = useBatchSimulator
+        self.maxPlayoutPlies = maxPlayoutPlies
+        self.persistentSearch = persistentSearch
+        self.transpositionTable = transpositionTable
+        self.latencyRecorder = latencyRecorder
+        self.openingBook = openingBook
+
+    def newSearch(self, game, uctConst) :
+        return MonteCarloTreeSearch(game, uctConst, self.transpositionTable, wideningCoeff = self.wideningCoeff,
+                                    playoutBatchSize = self.playoutBatchSize, useBatchSimulator = self.useBatchSimulator,
+                                    maxPlayoutPlies = self.maxPlayoutPlies)
+
+
+def chooseNextMove(game, uctConst, numOfMCTSSimulations, verbose=False, options=None) :
+        d0 = time.monotonic()
+        if (options is None) :
+            options = SearchOptions()
+        
+        # positions of the opening book (see openingBook.py) are not searched
+        openingBook = options.openingBook
+        if (not openingBook is None) :
+            bookMove = openingBook.chooseMove(game)
+            if (not bookMove is None) :
+                print(f"\tbook move {bookMove}")
+                return bookMove
         
         # heuristic:
         # for first move of each pawn
@@ -355,12 +980,27 @@ def chooseNextMove(game, uctConst, numOfMCTSSimulations, verbose=False) :
             bestMove = random.choice(bestMoves) 
             return bestMove
 
-        mcts = MonteCarloTreeSearch(game, uctConst)
+        persistentSearch = options.persistentSearch
+        if (persistentSearch is None) :
+            mcts = options.newSearch(game, uctConst)
+        else :
+            mcts = persistentSearch.getSearch(game, uctConst, options)
         
-        mcts.search(numOfMCTSSimulations)
+        numOfSimulationsBefore = mcts.totalNumOfSimulations
+        if (options.numOfWorkers > 1) :
+            mcts.searchRootParallel(numOfMCTSSimulations, options.numOfWorkers, options.seed, options.timeBudgetMs)
+        else :
+            mcts.search(numOfMCTSSimulations, options.timeBudgetMs)
+        
+        if (not persistentSearch is None) :
+            persistentSearch.keepSearch(game, mcts)
         
         best = mcts.selectBestMove()
         print(best)
+        if (best is None) :
+            # no move was searched, e.g. the root is terminal or the node store is full
+            nextPosition = chooseShortestPathNextPawnPosition(game)
+            return [[nextPosition.row, nextPosition.col], None, None]
         bestMove = best["move"]
         winRate = best["winRate"]
         
@@ -382,9 +1022,11 @@ def chooseNextMove(game, uctConst, numOfMCTSSimulations, verbose=False) :
                 bestMove = [[nextPosition.row, nextPosition.col], None, None]
             
         
-        d1 = time.time()
+        d1 = time.monotonic()
+        if (not options.latencyRecorder is None) :
+            options.latencyRecorder.record((d1 - d0) * 1000)
         uctConst = mcts.root.children[0].uctConst
-        print(f"\ttime taken by AI for {(numOfMCTSSimulations)} playouts, c={(uctConst)}: {(d1 - d0):.2f} sec")
+        print(f"\ttime taken by AI for {(mcts.totalNumOfSimulations - numOfSimulationsBefore)} playouts, c={(uctConst)}: {(d1 - d0):.2f} sec")
 
         if (verbose) :
             print("descend maxWinRateChild")
@@ -412,70 +1054,57 @@ def chooseNextMove(game, uctConst, numOfMCTSSimulations, verbose=False) :
         return bestMove
 
 
-def getRandomShortestPathToGoal(pawn, game) :
-        # This is one of bottle neck, so did inlining...
-        #visited = create2DArrayInitializedTo(9, 9, False)
-        #dist = create2DArrayInitializedTo(9, 9, np.inf)
-        #prev = create2DArrayInitializedTo(9, 9, None)
-        visited = [
-            [False, False, False, False, False, False, False, False, False],
-            [False, False, False, False, False, False, False, False, False],
-            [False, False, False, False, False, False, False, False, False],
-            [False, False, False, False, False, False, False, False, False],
-            [False, False, False, False, False, False, False, False, False],
-            [False, False, False, False, False, False, False, False, False],
-            [False, False, False, False, False, False, False, False, False],
-            [False, False, False, False, False, False, False, False, False],
-            [False, False, False, False, False, False, False, False, False],
-        ]
-        dist = [
-            [np.inf, np.inf, np.inf, np.inf, np.inf, np.inf, np.inf, np.inf, np.inf],
-            [np.inf, np.inf, np.inf, np.inf, np.inf, np.inf, np.inf, np.inf, np.inf],
-            [np.inf, np.inf, np.inf, np.inf, np.inf, np.inf, np.inf, np.inf, np.inf],
-            [np.inf, np.inf, np.inf, np.inf, np.inf, np.inf, np.inf, np.inf, np.inf],
-            [np.inf, np.inf, np.inf, np.inf, np.inf, np.inf, np.inf, np.inf, np.inf],
-            [np.inf, np.inf, np.inf, np.inf, np.inf, np.inf, np.inf, np.inf, np.inf],
-            [np.inf, np.inf, np.inf, np.inf, np.inf, np.inf, np.inf, np.inf, np.inf],
-            [np.inf, np.inf, np.inf, np.inf, np.inf, np.inf, np.inf, np.inf, np.inf],
-            [np.inf, np.inf, np.inf, np.inf, np.inf, np.inf, np.inf, np.inf, np.inf]
-        ]
-        prev = [
-            [None, None, None, None, None, None, None, None, None],
-            [None, None, None, None, None, None, None, None, None],
-            [None, None, None, None, None, None, None, None, None],
-            [None, None, None, None, None, None, None, None, None],
-            [None, None, None, None, None, None, None, None, None],
-            [None, None, None, None, None, None, None, None, None],
-            [None, None, None, None, None, None, None, None, None],
-            [None, None, None, None, None, None, None, None, None],
-            [None, None, None, None, None, None, None, None, None]
-        ]
-        pawnMoveTuples = GAME.MOVES[:]
-        random.shuffle(pawnMoveTuples)
-        queue = []
-        
-       
-        visited[pawn.position.row][pawn.position.col] = True
-        dist[pawn.position.row][pawn.position.col] = 0
-        queue.append(pawn.position)
-        while (len(queue) > 0) :
-            position = queue.pop(0) # to be checked
-            if (position.row == pawn.goalRow) :
-                goalPosition = position
-                return [dist, prev, goalPosition]
+# Preallocated buffers of the breadth first search in randomShortestPathToGoalCell.
+# Cells are integer indices: row * 9 + col.
+_bfsBuffers = [[-1] * 81, [-1] * 81, [0] * 81]
+UNVISITED = [-1] * 81
+# shared positions of the cells, for the 2D arrays of get2DArrayPrevAndNextAndDistanceToGoalFor: not to be changed
+CELL_POSITIONS = [GAME.PawnPosition(cell // 9, cell % 9) for cell in range(81)]
+CELL_POSITIONS_OR_NONE = CELL_POSITIONS + [None]   # index -1 (no cell) is None
+
+
+def getBfsBuffers() :
+    # [dist, prev, queue]. dist is -1 and prev is -1 for cells not visited.
+    return _bfsBuffers
+
+
+def randomShortestPathToGoalCell(pawn, game) :
+        # This is one of bottle neck, so it allocates nothing per visited cell:
+        # the search runs on the preallocated flat arrays of getBfsBuffers, which hold dist and prev afterwards.
+        # Returns the goal cell found first, -1 if the goal line is not reachable.
+        dist, prev, queue = getBfsBuffers()
+        dist[:] = UNVISITED
+        prev[:] = UNVISITED
+        pawnMoves = [0, 1, 2, 3]
+        random.shuffle(pawnMoves)
+        openEdges = game.openEdges
+        neighborCellsOf = GAME.NEIGHBOR_CELLS
+        neighborEdgesOf = GAME.NEIGHBOR_EDGES
+        goalRow = pawn.goalRow
+
+        start = pawn.position.row * 9 + pawn.position.col
+        dist[start] = 0
+        queue[0] = start
+        head = 0
+        tail = 1
+        while (head < tail) :
+            cell = queue[head]
+            head += 1
+            if (cell // 9 == goalRow) :
+                return cell
             
-            for i in range(len(pawnMoveTuples)) : 
-                if (game.isOpenWay(position.row, position.col, pawnMoveTuples[i])) :
-                    nextPosition = position.newPosition(pawnMoveTuples[i])
-                    if not visited[nextPosition.row][nextPosition.col] :
-                        alt = dist[position.row][position.col] + 1
-                        dist[nextPosition.row][nextPosition.col] = alt
-                        prev[nextPosition.row][nextPosition.col] = position
-                        visited[nextPosition.row][nextPosition.col] = True
-                        queue.append(nextPosition)
-                    
+            alt = dist[cell] + 1
+            neighborEdges = neighborEdgesOf[cell]
+            for pawnMove in pawnMoves : 
+                if (openEdges[neighborEdges[pawnMove]]) :
+                    nextCell = neighborCellsOf[cell][pawnMove]
+                    if (dist[nextCell] < 0) :
+                        dist[nextCell] = alt
+                        prev[nextCell] = cell
+                        queue[tail] = nextCell
+                        tail += 1
                 
-        return [dist, prev, None]
+        return -1
 
 
 def chooseShortestPathNextPawnPosition(game) :
@@ -489,88 +1118,127 @@ def chooseShortestPathNextPawnPosition(game) :
             nextPositions = chooseShortestPathNextPawnPositionsThoroughly(game)
             nextPosition = random.choice(nextPositions)
         else : 
-            next = get2DArrayPrevAndNextAndDistanceToGoalFor(game.getPawnAtTurn(returnTurn = True), game)[1]
+            prevAndNextAndDistance = get2DArrayPrevAndNextAndDistanceToGoalFor(game.getPawnAtTurn(returnTurn = True), game)
+            if (prevAndNextAndDistance is None) :
+                return None
+            next = prevAndNextAndDistance[1]
             currentPosition = game.getPawnAtTurn(returnTurn = True).position
             nextPosition = next[currentPosition.row][currentPosition.col] 
 
             # if already in goal position.
             if (nextPosition is None) :
                 print("really?? already in goal position")
+            else :
+                # positions of the 2D arrays are shared (see CELL_POSITIONS)
+                nextPosition = GAME.PawnPosition(nextPosition.row, nextPosition.col)
         
         return nextPosition
     
 
 
-def getShortestDistanceToGoalFor(pawn, game) :
-        t = getRandomShortestPathToGoal(pawn, game)
-        dist = t[0]
-        goalPosition = t[2]
-        if (goalPosition is None) :
-            return np.inf
-        
-        return dist[goalPosition.row][goalPosition.col]
+def evaluatePosition(game) :
+        # the probability that pawn 0 wins the game, from the lead of pawn 0 in steps (see EVALUATION_STEP_WEIGHT)
+        pawn0, pawn1 = game.board.pawns
+        lead = (game.distancesToGoal[1][pawn1.position.row * 9 + pawn1.position.col]
+                - game.distancesToGoal[0][pawn0.position.row * 9 + pawn0.position.col])
+        lead += EVALUATION_TEMPO_STEPS if game.turn % 2 == 0 else -EVALUATION_TEMPO_STEPS
+        lead += EVALUATION_WALL_STEPS * (pawn0.numberOfLeftWalls - pawn1.numberOfLeftWalls)
+        return 1 / (1 + math.exp(-EVALUATION_STEP_WEIGHT * lead))
 
 def chooseShortestPathNextPawnPositionsThoroughly(game) :
-        valids = GAME.indicesOfValueIn2DArray(game.getValidNextPositions(), True)
-        distances = []
-        for i in range(len(valids)) :
-            clonedGame = copy.deepcopy(game)
-            clonedGame.movePawn(valids[i][0], valids[i][1])
-            distance = getShortestDistanceToGoalFor(clonedGame.getPawnAtTurn(returnTurn = False), clonedGame)
-            distances.append(distance)
-        
-        
-        indices_min = [i for i, d in enumerate(distances) if d == np.min(distances)]
-        nextPositions = []
+        # valid next positions of the pawn of turn nearest to its goal line
+        distancesToGoal = game.distancesToGoal[game.turn % 2]
+        valids = game.getArrOfValidNextPositionTuples()
+        distances = [distancesToGoal[row * 9 + col] for row, col in valids]
+        minDistance = min(distances)
+        return [GAME.PawnPosition(row, col) for (row, col), distance in zip(valids, distances) if distance == minDistance]
 
-        for index in indices_min :
-            nextPositions.append( GAME.PawnPosition(valids[index][0], valids[index][1]))
-        
-        return nextPositions
+
+def chooseAdjacentPositionAtDistance(game, pawn, distanceChange) :
+        # a random adjacent position of the pawn, through an open way and not taken by the other pawn,
+        # at (distance of the pawn to its goal line) + distanceChange from the goal line. None if there is none.
+        distances = game.distancesToGoal[pawn.index]
+        cell = pawn.position.row * 9 + pawn.position.col
+        otherPosition = game.board.pawns[1 - pawn.index].position
+        otherCell = otherPosition.row * 9 + otherPosition.col
+        distance = distances[cell] + distanceChange
+        openEdges = game.openEdges
+        neighborCells = GAME.NEIGHBOR_CELLS[cell]
+        neighborEdges = GAME.NEIGHBOR_EDGES[cell]
+        nextCells = [neighborCells[move] for move in range(4)
+                     if openEdges[neighborEdges[move]] and distances[neighborCells[move]] == distance and neighborCells[move] != otherCell]
+        if (len(nextCells) == 0) :
+            return None
+        cell = random.choice(nextCells)
+        return GAME.PawnPosition(cell // 9, cell % 9)
 
 
 # get 2D array "next" to closest goal in the game
+# None if the goal line is not reachable.
 def get2DArrayPrevAndNextAndDistanceToGoalFor(pawn, game) :
-        t = getRandomShortestPathToGoal(pawn, game)
-        dist = t[0]
-        prev = t[1]
-        goalPosition = t[2]
-        distanceToGoal = dist[goalPosition.row][goalPosition.col]
-        next = getNextByReversingPrev(prev, goalPosition)
-        return [prev, next, distanceToGoal]
+        goalCell = randomShortestPathToGoalCell(pawn, game)
+        if (goalCell < 0) :
+            return None
+        dist, prev, queue = getBfsBuffers()
+        distanceToGoal = dist[goalCell]
+        
+        # reverse prev along the path, from the goal cell
+        nextFlat = UNVISITED[:]
+        cell = goalCell
+        while (prev[cell] >= 0) :
+            nextFlat[prev[cell]] = cell
+            cell = prev[cell]
+        
+        prev2D = [[CELL_POSITIONS_OR_NONE[p] for p in prev[row * 9 : row * 9 + 9]] for row in range(9)]
+        next2D = [[CELL_POSITIONS_OR_NONE[n] for n in nextFlat[row * 9 : row * 9 + 9]] for row in range(9)]
+        return [prev2D, next2D, distanceToGoal]
 
 def arePawnsAdjacent(game) :
-        pawn0 = game.getPawnAtTurn(returnTurn= True)
-        pawn1 = game.getPawnAtTurn(returnTurn= False)
-        return ((pawn1.position.row == pawn0.position.row
-                and np.abs(pawn1.position.col - pawn0.position.col) == 1)
-                or (pawn1.position.col == pawn0.position.col
-                    and np.abs(pawn1.position.row - pawn0.position.row) == 1))
+        position0 = game.getPawnAtTurn(returnTurn= True).position
+        position1 = game.getPawnAtTurn(returnTurn= False).position
+        return position1.row * 9 + position1.col in GAME.NEIGHBOR_CELLS[position0.row * 9 + position0.col]
     
 
 def chooseProbableNextWall(game) :
-        nextMoves = []
-        nextHorizontals = GAME.indicesOfValueIn2DArray(game.probableValidNextWalls()["horizontal"], True) ##TO BE DONE
-        for i in range(len(nextHorizontals)) : 
-            nextMoves.append([None, nextHorizontals[i], None])
-        
-        nextVerticals = GAME.indicesOfValueIn2DArray(game.probableValidNextWalls()["vertical"], True) ##TO BE DONE
-        for i in range(len(nextVerticals)) :
-            nextMoves.append([None, None, nextVerticals[i]])
-        
-        if (len(nextMoves) == 0) :
+        # a random probable next wall which does not block a path, None if there is none.
+        # Candidates are the bits of one mask: horizontal walls at bits 0 to 63, vertical walls at bits 64 to 127.
+        # Only a wall cutting the shortest path of a pawn can block a path,
+        # so the other walls are drawn without searching (see pathCuttingWallsMasks).
+        # A drawn cutting wall is searched (isPossibleNextMove), which is much cheaper than the connectivity index
+        # (see Game.noBlockWalls) and almost never finds it blocking. If it does, the wall is drawn again
+        # among the candidates the index finds legal: at most one search and one index per wall, uniform over legal walls.
+        horizontals, verticals = game.probableValidNextWallsMasks()
+        candidates = horizontals | (verticals << 64)
+        if (candidates == 0) :
             return None
+        cuttingHorizontals, cuttingVerticals = game.pathCuttingWallsMasks()
+        cutting = cuttingHorizontals | (cuttingVerticals << 64)
+        wall = randomBitOf(candidates)
+        nextMove = wallMoveOfBit(wall)
+        if (not wall & cutting or game.isPossibleNextMove(nextMove)) :
+            return nextMove
         
-        nextMoveIndex = random.choice(list(range(len(nextMoves))))
-        while(not game.isPossibleNextMove(nextMoves[nextMoveIndex])) :
-            nextMoves.pop(nextMoveIndex)
-            if (len(nextMoves) == 0) :
-                print("Is it really possible???")
-                return None  # is it possible?? I'm not sure..
-            
-            nextMoveIndex = random.choice(list(range(len(nextMoves))))
-        
-        return nextMoves[nextMoveIndex]
+        noBlockHorizontals, noBlockVerticals = GAME.masksFrom2DArrays(game.noBlockWalls())
+        candidates &= ~cutting | noBlockHorizontals | (noBlockVerticals << 64)
+        if (candidates == 0) :
+            print("Is it really possible???")  # every probable next wall blocks a path
+            return None
+        return wallMoveOfBit(randomBitOf(candidates))
+
+
+def randomBitOf(mask) :
+        # a random set bit of the mask, as a mask: the k-th set bit in the order of the bits
+        for i in range(random.randrange(mask.bit_count())) :
+            mask &= mask - 1
+        return mask & -mask
+
+
+def wallMoveOfBit(wall) :
+        # the wall move of a bit of the candidates of chooseProbableNextWall
+        w = wall.bit_length() - 1
+        if (w < 64) :
+            return [None, [w // 8, w % 8], None]
+        return [None, None, [(w - 64) // 8, (w - 64) % 8]]
     
 
 def chooseNextPawnPositionRandomly(game) :
@@ -580,12 +1248,33 @@ def chooseNextPawnPositionRandomly(game) :
     
 
 
-def getNextByReversingPrev(prev, goalPosition) :
-        next = GAME.initialBoard(9, 9, None)
-        position = goalPosition
-        while(prev[position.row][position.col]) :
-            prevPosition = prev[position.row][position.col]
-            next[prevPosition.row][prevPosition.col] = position
-            position = prevPosition
-        
-        return next
\ No newline at end of file
+def isNoBlockWallMove(noBlockWalls, move) :
+    # for wall children added by expansion, with the verdicts of game.noBlockWalls()
+    if (not move[1] is None) :
+        return noBlockWalls["horizontal"][move[1][0]][move[1][1]]
+    elif (not move[2] is None) :
+        return noBlockWalls["vertical"][move[2][0]][move[2][1]]
+    return True
+
+
+def getWallMovesByPrior(game, horizontals, verticals) :
+    # wall moves in the order of a cheap prior, best first (stable for equal priors):
+    # the number of ways on shortest paths of the opponent closed by the wall,
+    # minus the number of ways on shortest paths of the pawn of turn closed by the wall.
+    # It stands for the increase of the path length of each pawn by the wall, which only walls closing such ways can have.
+    # The exact increases (an A* search from each pawn over distancesToGoal per wall) made expansion 2.5 to 3 times slower
+    # in benchmarks/progressiveWidening.py, with no better agreement with the reference search.
+    ownWays = GAME.getShortestPathsWaysOf(game.getPawnAtTurn(returnTurn = True), game)
+    opponentWays = GAME.getShortestPathsWaysOf(game.getPawnAtTurn(returnTurn = False), game)
+    wallMoves = []
+    priors = []
+    for row, col in horizontals :
+        closedWays = GAME.HORIZONTAL_WALL_EDGES[row * 8 + col]
+        wallMoves.append([None, [row, col], None])
+        priors.append(sum(way in opponentWays for way in closedWays) - sum(way in ownWays for way in closedWays))
+    for row, col in verticals :
+        closedWays = GAME.VERTICAL_WALL_EDGES[row * 8 + col]
+        wallMoves.append([None, None, [row, col]])
+        priors.append(sum(way in opponentWays for way in closedWays) - sum(way in ownWays for way in closedWays))
+    order = sorted(range(len(wallMoves)), key = lambda i : -priors[i])
+    return [wallMoves[i] for i in order]
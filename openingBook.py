@@ -0,0 +1,156 @@
+import os
+import io
+import copy
+import mmap
+import time
+import random
+import struct
+import argparse
+import contextlib
+import game as GAME
+import montecarloSearch as MCTS
+
+# Opening book: statistics of deep searches on opening positions, computed offline and looked up instead of searching.
+#
+# The book file is a header followed by fixed size records sorted by position hash (game.Game.hash),
+# the best moves of a position being consecutive and in the order of the number of simulations:
+#   header : magic, number of records
+#   record : position hash (u64), move code (u16, see montecarloSearch.encodeMove), win rate (f32), simulations (u32)
+# At runtime the file is memory mapped and a position is found by binary search, so nothing is loaded up front.
+#
+# usage (builder): python openingBook.py [--plies N] [--simulations N] [--moves N] [--output FILE]
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "openingBook.bin")
+
+MAGIC = b"QBK1"
+HEADER = struct.Struct("<4sI")
+RECORD = struct.Struct("<QHfI")
+
+
+def writeOpeningBook(path, records) :
+    # records: (hash, move code, win rate, simulations), the best moves of a position first
+    order = sorted(range(len(records)), key = lambda i : (records[i][0], i))
+    with open(path, "wb") as f :
+        f.write(HEADER.pack(MAGIC, len(records)))
+        for i in order :
+            f.write(RECORD.pack(*records[i]))
+
+
+class OpeningBook :
+    def __init__(self, path = DEFAULT_PATH) :
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ)
+        magic, self.numOfRecords = HEADER.unpack_from(self.data, 0)
+        if (magic != MAGIC or len(self.data) != HEADER.size + self.numOfRecords * RECORD.size) :
+            self.close()
+            raise ValueError(f"{path} is not an opening book")
+
+    def close(self) :
+        self.data.close()
+        self.file.close()
+
+    def __len__(self) :
+        return self.numOfRecords
+
+    def recordAt(self, i) :
+        return RECORD.unpack_from(self.data, HEADER.size + i * RECORD.size)
+
+    def lookup(self, h) :
+        # the book moves of the position of hash h, best first: [{"move", "winRate", "numSims"}], [] if not in the book
+        low = 0
+        high = self.numOfRecords
+        while (low < high) :
+            middle = (low + high) // 2
+            if (self.recordAt(middle)[0] < h) :
+                low = middle + 1
+            else :
+                high = middle
+
+        bookMoves = []
+        for i in range(low, self.numOfRecords) :
+            recordHash, moveCode, winRate, numSims = self.recordAt(i)
+            if (recordHash != h) :
+                break
+            bookMoves.append({"move": MCTS.decodeMove(moveCode), "winRate": winRate, "numSims": numSims})
+        return bookMoves
+
+    def chooseMove(self, game) :
+        # the best book move of the game's position, None if the position is not in the book.
+        # A move which is not possible (hash collision) is skipped.
+        for bookMove in self.lookup(game.hash) :
+            if (isPossibleBookMove(game, bookMove["move"])) :
+                return bookMove["move"]
+        return None
+
+
+def isPossibleBookMove(game, move) :
+    if (move[0]) :
+        return game.getValidNextPositions()[move[0][0]][move[0][1]]
+    if (game.getPawnAtTurn(returnTurn = True).numberOfLeftWalls <= 0) :
+        return False
+    if (move[1]) :
+        return game.validNextWalls["horizontal"][move[1][0]][move[1][1]] and game.isPossibleNextMove(move)
+    return game.validNextWalls["vertical"][move[2][0]][move[2][1]] and game.isPossibleNextMove(move)
+
+
+def buildOpeningBook(path, numOfPlies, numOfSimulations, uctConst = 0.4, numOfMovesPerPosition = 3, seed = 0) :
+    # Searches the positions of the first numOfPlies plies, from both initial positions (AI first and human first),
+    # and writes the numOfMovesPerPosition most searched moves of each position.
+    # Every position reachable in the first plies is far too many (about 130 moves per ply),
+    # so the book follows, from each position, its book moves and all pawn moves.
+    # returns the number of positions searched.
+    random.seed(seed)
+    records = []
+    searched = set()
+    positions = [GAME.Game(False), GAME.Game(True)]
+    for ply in range(numOfPlies) :
+        nextPositions = []
+        for game in positions :
+            if (game.hash in searched or not game.winner is None) :
+                continue
+            searched.add(game.hash)
+
+            d0 = time.monotonic()
+            mcts = MCTS.MonteCarloTreeSearch(game, uctConst)
+            with contextlib.redirect_stdout(io.StringIO()) :
+                mcts.search(numOfSimulations)
+            # children never played out have no win rate, and with few simulations there can be none
+            children = [child for child in mcts.root.children if child.numSims > 0]
+            if (len(children) == 0) :
+                continue
+            children = sorted(children, key = lambda child : -child.numSims)[:numOfMovesPerPosition]
+            for child in children :
+                records.append((game.hash, MCTS.encodeMove(child.move), child.winRate(), child.numSims))
+            print(f"ply {ply}, position {len(searched)}: {children[0].move} {children[0].winRate():.3f} ({time.monotonic() - d0:.1f} sec)")
+
+            nextMoves = [child.move for child in children]
+            nextMoveCodes = set(MCTS.encodeMove(move) for move in nextMoves)
+            for row, col in game.getArrOfValidNextPositionTuples() :
+                if (not MCTS.encodeMove([[row, col], None, None]) in nextMoveCodes) :
+                    nextMoves.append([[row, col], None, None])
+            for move in nextMoves :
+                nextGame = copy.deepcopy(game)
+                nextGame.doMove(move)
+                nextPositions.append(nextGame)
+        positions = nextPositions
+
+    writeOpeningBook(path, records)
+    return len(searched)
+
+
+def main() :
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--plies", type=int, default=4)
+    parser.add_argument("--simulations", type=int, default=5000)
+    parser.add_argument("--moves", type=int, default=3, help="book moves kept for each position")
+    parser.add_argument("--uctConst", type=float, default=0.4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=DEFAULT_PATH)
+    args = parser.parse_args()
+
+    numOfPositions = buildOpeningBook(args.output, args.plies, args.simulations, args.uctConst, args.moves, seed = args.seed)
+    print(f"{numOfPositions} positions written to {args.output}")
+
+
+if __name__ == "__main__" :
+    main()